@@ -0,0 +1,373 @@
+"""Run the commands from JSON lines without the interactive menu.
+
+Every input line is one command object with the "op" name and its
+arguments, e.g.
+
+    {"op": "add-contact", "name": "Olena", "phones": ["0501234567"], "tags": ["work"]}
+    {"op": "edit-contact", "name": "Olena", "email": "olena@example.com", "add_tags": ["family"]}
+    {"op": "search-contacts", "query": "olena", "fuzzy": true, "limit": 5}
+
+and gets one JSON line with the result:
+
+    {"line": 3, "ok": true, "result": [...]}
+    {"line": 4, "ok": false, "error": "..."}
+
+The optional "id" of the command is copied into its result.
+"""
+import json
+import os
+import sys
+import time
+from typing import IO, TYPE_CHECKING, Callable, Iterable
+
+from fields.address import Address
+from fields.address_book import AddressBook
+from fields.birthday import Birthday, format_date
+from fields.email import Email
+from fields.notes import Content, Note, Notes, Title
+from fields.phone import Phone
+from fields.record import Record
+from fields.tag import Tag
+from fields.tag_registry import registry as tag_registry
+from fields.validators import validate_name
+from storage import AutoSaver, Journal
+
+if TYPE_CHECKING:
+    from storage.sharded import ShardedStore
+    from storage.sqlite_store import SQLiteStore
+
+
+def _arg(command: dict, name: str):
+    """Get the required argument of the command."""
+    if name not in command:
+        raise ValueError(f"The '{name}' argument is required for '{command['op']}'.")
+    return command[name]
+
+
+def _check_strings(command: dict, *names: str, nullable: bool = False) -> None:
+    """Raise ValueError for the arguments of the command which are not strings, or None if `nullable`."""
+    for name in names:
+        if name in command and not isinstance(command[name], str) and not (nullable and command[name] is None):
+            raise ValueError(f"The '{name}' argument should be a string.")
+
+
+def _check_string_lists(command: dict, *names: str) -> None:
+    """Raise ValueError for the arguments of the command which are not lists of strings."""
+    for name in names:
+        value = command.get(name, [])
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"The '{name}' argument should be a list of strings.")
+
+
+def _check_limit(command: dict) -> None:
+    """Raise ValueError if the "limit" argument of the command is neither a whole number nor None."""
+    limit = command.get("limit")
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool)):
+        raise ValueError("The 'limit' argument should be a whole number.")
+
+
+def _contact(book: AddressBook, name: str) -> Record:
+    record = book.find(name)
+    if record is None:
+        raise KeyError(f"The record with name '{name}' is not found.")
+    return record
+
+
+def _note(notes: Notes, title: str) -> Note:
+    note = notes.find_note(title)
+    if note is None:
+        raise KeyError(f"Note with title: '{title}' is not found.")
+    return note
+
+
+def _check_contact_edit(book: AddressBook, record: Record, command: dict) -> None:
+    """Validate every change of the edit, so that a failed edit leaves the record as it was."""
+    for number in command.get("add_phones", []):
+        Phone(number)
+    "email" in command and Email(command["email"])
+    "address" in command and Address(command["address"])
+    "birthday" in command and Birthday(command["birthday"])
+    for tag in command.get("add_tags", []):
+        Tag(tag)
+    new_name = command.get("new_name")
+    if new_name:
+        if not validate_name(new_name):
+            raise ValueError("Invalid name. Please use only letters.")
+        if new_name != record.name.value and book.find(new_name) is not None:
+            raise KeyError(f"The record with name '{new_name}' already exists.")
+
+
+def _check_note_edit(notes: Notes, note: Note, command: dict) -> None:
+    """Validate every change of the edit, so that a failed edit leaves the note as it was."""
+    "content" in command and Content(command["content"])
+    for tag in command.get("add_tags", []):
+        Tag(tag)
+    new_title = command.get("new_title")
+    if new_title:
+        Title(new_title)
+        if new_title != note.title.value and notes.find_note(new_title) is not None:
+            raise KeyError(f"Note with title: '{new_title}' already exists.")
+
+
+def add_contact(book: AddressBook, notes: Notes, command: dict) -> dict:
+    _check_strings(command, "name")
+    _check_strings(command, "email", "address", "birthday", nullable=True)
+    _check_string_lists(command, "phones", "tags")
+    if not validate_name(_arg(command, "name")):
+        raise ValueError("Invalid name. Please use only letters.")
+    record = Record.from_dict(command)
+    book.add(record)
+    return record.to_dict()
+
+
+def edit_contact(book: AddressBook, notes: Notes, command: dict) -> dict:
+    _check_strings(command, "name", "email", "address", "birthday", "new_name")
+    _check_string_lists(command, "remove_phones", "add_phones", "remove_tags", "add_tags")
+    record = _contact(book, _arg(command, "name"))
+    _check_contact_edit(book, record, command)
+    for number in command.get("remove_phones", []):
+        record.remove_phone(number)
+    for number in command.get("add_phones", []):
+        record.add_phone(number)
+    "email" in command and record.edit_email(command["email"])
+    "address" in command and record.edit_address(command["address"])
+    "birthday" in command and record.add_birthday(command["birthday"])
+    command.get("remove_tags") and record.remove_tags(command["remove_tags"])
+    command.get("add_tags") and record.add_tags(command["add_tags"])
+    command.get("new_name") and record.change_name(command["new_name"])
+    return record.to_dict()
+
+
+def delete_contact(book: AddressBook, notes: Notes, command: dict) -> str:
+    _check_strings(command, "name")
+    name = _arg(command, "name")
+    book.delete(name)
+    return name
+
+
+def find_contact(book: AddressBook, notes: Notes, command: dict) -> dict:
+    _check_strings(command, "name")
+    return _contact(book, _arg(command, "name")).to_dict()
+
+
+def search_contacts(book: AddressBook, notes: Notes, command: dict) -> list[dict]:
+    _check_strings(command, "query", "tag", "order")
+    _check_limit(command)
+    query, tag, limit = command.get("query", ""), command.get("tag", ""), command.get("limit")
+    if command.get("fuzzy"):
+        records = book.fuzzy_search(query, tag, limit or 10)
+    else:
+        records = book.search(query, tag, "name", command.get("order", "asc"))[:limit]
+    return [record.to_dict() for record in records]
+
+
+def lookup_phone(book: AddressBook, notes: Notes, command: dict) -> list[str]:
+    _check_strings(command, "phone")
+    _check_limit(command)
+    records = book.find_by_phone(_arg(command, "phone"), command.get("prefix", False), command.get("limit"))
+    return [record.name.value for record in records]
+
+
+def birthdays(book: AddressBook, notes: Notes, command: dict) -> list[dict]:
+    days = command.get("days", 7)
+    if not isinstance(days, int) or days < 0:
+        raise ValueError("The number of days should be a positive number.")
+    return [{"name": name, "date": format_date(birthday)} for birthday, name in book.upcoming_birthdays(days)]
+
+
+def add_note(book: AddressBook, notes: Notes, command: dict) -> dict:
+    _check_strings(command, "title")
+    _check_strings(command, "content", nullable=True)
+    _check_string_lists(command, "tags")
+    note = Note.from_dict(command)
+    notes.add(note)
+    return note.to_dict()
+
+
+def edit_note(book: AddressBook, notes: Notes, command: dict) -> dict:
+    _check_strings(command, "title", "content", "new_title")
+    _check_string_lists(command, "remove_tags", "add_tags")
+    note = _note(notes, _arg(command, "title"))
+    _check_note_edit(notes, note, command)
+    "content" in command and note.add_content(command["content"])
+    command.get("remove_tags") and note.remove_tags(command["remove_tags"])
+    command.get("add_tags") and note.add_tags(command["add_tags"])
+    command.get("new_title") and note.change_title(command["new_title"])
+    return note.to_dict()
+
+
+def delete_note(book: AddressBook, notes: Notes, command: dict) -> str:
+    _check_strings(command, "title")
+    title = _arg(command, "title")
+    notes.delete(title)
+    return title
+
+
+def find_note(book: AddressBook, notes: Notes, command: dict) -> dict:
+    _check_strings(command, "title")
+    title = _arg(command, "title")
+    note = notes.find_note(title, command.get("ignore_case", False))
+    if note is None:
+        raise KeyError(f"Note with title: '{title}' is not found.")
+    return note.to_dict()
+
+
+def search_notes(book: AddressBook, notes: Notes, command: dict) -> list[dict]:
+    _check_strings(command, "query", "tag", "order")
+    _check_limit(command)
+    query, tag, limit = command.get("query", ""), command.get("tag", ""), command.get("limit")
+    if command.get("fuzzy"):
+        found = notes.fuzzy_search(query, tag, limit or 10)
+    else:
+        found = notes.search(query, tag, "title", command.get("order", "asc"))[:limit]
+    return [note.to_dict() for note in found]
+
+
+def rename_tag(book: AddressBook, notes: Notes, command: dict) -> str:
+    _check_strings(command, "old", "new")
+    old_tag, new_tag = _arg(command, "old"), _arg(command, "new")
+    if not book.count_tag(old_tag) and not notes.count_tag(old_tag):
+        raise KeyError(f"The tag '{old_tag}' is not found.")
+    # the tags of the contacts and notes kept in the store are not registered until they are loaded
+    tag_registry.intern(old_tag)
+    tag_registry.rename(old_tag, new_tag)
+    return new_tag
+
+
+COMMANDS: dict[str, Callable[[AddressBook, Notes, dict], object]] = {
+    "add-contact": add_contact,
+    "edit-contact": edit_contact,
+    "delete-contact": delete_contact,
+    "find-contact": find_contact,
+    "search-contacts": search_contacts,
+    "lookup-phone": lookup_phone,
+    "birthdays": birthdays,
+    "add-note": add_note,
+    "edit-note": edit_note,
+    "delete-note": delete_note,
+    "find-note": find_note,
+    "search-notes": search_notes,
+    "rename-tag": rename_tag,
+}
+
+
+def run_command(book: AddressBook, notes: Notes, command: dict) -> object:
+    """Run one command and get its result, raise ValueError, KeyError or TypeError for invalid commands."""
+    if not isinstance(command, dict):
+        raise ValueError("The command should be a JSON object.")
+    handler = COMMANDS.get(command.get("op"))
+    if handler is None:
+        raise ValueError(f"Unknown op '{command.get('op')}'.")
+    return handler(book, notes, command)
+
+
+class BatchReport:
+    """Number of the commands run and failed and how long it took."""
+
+    def __init__(self) -> None:
+        self.commands = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    @property
+    def commands_per_second(self) -> float:
+        return self.commands / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Commands run: {self.commands} ({self.commands_per_second:.0f} commands/s), failed: {self.failed}"
+        )
+
+
+def run_batch(
+    book: AddressBook,
+    notes: Notes,
+    lines: Iterable[str],
+    output: IO[str],
+    save: Callable[[], None] | None = None,
+    save_every: int = 0,
+) -> BatchReport:
+    """Run the JSON line commands and write a JSON line result for each.
+
+    `save` is called after every `save_every` commands if it is not 0, the
+    caller saves the rest of the changes.
+    """
+    report = BatchReport()
+    started = time.perf_counter()
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        report.commands += 1
+        result = {"line": line_number}
+        try:
+            command = json.loads(line)
+            if isinstance(command, dict) and "id" in command:
+                result["id"] = command["id"]
+            result["result"] = run_command(book, notes, command)
+            result["ok"] = True
+        except (ValueError, KeyError, TypeError) as e:
+            report.failed += 1
+            result["ok"] = False
+            result["error"] = str(e.args[0]) if isinstance(e, KeyError) and e.args else str(e)
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+        if save is not None and save_every and report.commands % save_every == 0:
+            save()
+    output.flush()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def open_store(address_book_file: str = "var/addressbook.pkl") -> "SQLiteStore | ShardedStore | None":
+    """Open the store chosen with `TRIATEAMO_STORAGE`, "sqlite" or "sharded", or None to use the journal."""
+    storage = os.environ.get("TRIATEAMO_STORAGE")
+    base = os.path.splitext(address_book_file)[0]
+    if storage == "sqlite":
+        from storage.sqlite_store import SQLiteStore
+
+        return SQLiteStore(base + ".db")
+    if storage == "sharded":
+        from storage.sharded import ShardedStore
+
+        return ShardedStore(base + ".shards", int(os.environ.get("TRIATEAMO_SHARDS", 16)))
+    return None
+
+
+def open_collections(
+    address_book_file: str = "var/addressbook.pkl",
+) -> tuple[AddressBook, Notes, Journal | None, "SQLiteStore | ShardedStore | None"]:
+    """Open the saved collections with the journal, or the store chosen with `TRIATEAMO_STORAGE`."""
+    store = open_store(address_book_file)
+    if store is not None:
+        if store.is_empty():
+            store.import_collections(*Journal(address_book_file).load())
+        return AddressBook(store=store), Notes(store=store), None, store
+    journal = Journal(address_book_file)
+    book, notes = journal.load()
+    return book, notes, journal, None
+
+
+def main(filename: str, save_every: int = 0, address_book_file: str = "var/addressbook.pkl") -> int:
+    """Run the commands from the file, or stdin for '-', against the saved collections."""
+    book, notes, journal, store = open_collections(address_book_file)
+    # the store writes every change through, with the journal the changed
+    # contacts and notes are appended with a single sync
+    save = AutoSaver(journal, book, notes).flush if journal is not None else None
+
+    file = sys.stdin if filename == "-" else open(filename, encoding="utf-8")
+    try:
+        # not `sys.stdout`, colorama wraps it and slows down writing many lines
+        report = run_batch(book, notes, file, sys.__stdout__, save, save_every)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+        if journal is not None:
+            if book.pending_changes + notes.pending_changes >= journal.compact_every:
+                # writing the snapshot once is cheaper than journaling so many changes first
+                journal.compact()
+            else:
+                save()
+        if store is not None:
+            store.close()
+    print(report, file=sys.stderr)
+    return 1 if report.failed else 0
@@ -0,0 +1,100 @@
+"""Compare the birthday analytics packed into NumPy arrays with loops over the records.
+
+Every query is checked to give the same result as the loop, which is timed
+once, the vectorized query is timed as the best of `--repeat` runs.
+
+Run from the project root:
+
+    python -m benchmarks.birthday_analytics --size 1000000
+"""
+import argparse
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from benchmarks.datagen import generate_book
+
+
+def timed(func, repeat: int = 1) -> tuple[float, object]:
+    """Get the best ms of the calls and the result of the last one."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def loop_months(records: list) -> list[int]:
+    counts = Counter(record.birthday.date.month for record in records)
+    return [counts[month] for month in range(1, 13)]
+
+
+def loop_weeks(records: list, year: int) -> list[int]:
+    counts = [0] * date(year, 12, 28).isocalendar().week
+    for record in records:
+        week_year, week, _ = record.birthday.next_date(date(year, 1, 1)).isocalendar()
+        # the last days of December in the 1st week of the next year count in the 1st week
+        if week_year >= year:
+            counts[week - 1 if week_year == year else 0] += 1
+    return counts
+
+
+def loop_between(records: list, start: date, end: date) -> list[tuple[date, str]]:
+    pairs = []
+    for record in records:
+        birthday = record.birthday.next_date(start)
+        if birthday <= end:
+            pairs.append((birthday, record.name.value))
+    return sorted(pairs)
+
+
+def loop_ages(records: list, today: date, bucket: int) -> dict[int, int]:
+    counts = Counter()
+    for record in records:
+        born = record.birthday.date
+        age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+        if age >= 0:
+            counts[age // bucket * bucket] += 1
+    return dict(sorted(counts.items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200_000, help="the number of contacts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    book = generate_book(args.size, args.seed)
+    records = [record for record in book.data.values() if record.birthday]
+    today = date.today()
+    # the calendar index of `upcoming_birthdays()` is built on first use too
+    book.upcoming_birthdays(7)
+    build_ms, analytics = timed(book.birthday_analytics)
+    pack_ms, _ = timed(analytics.pack)
+    print(f"{len(records)} birthdays of {args.size} contacts, built in {build_ms:.0f} ms, packed in {pack_ms:.0f} ms")
+
+    cases = [
+        ("months", lambda: loop_months(records), analytics.month_histogram),
+        ("ages", lambda: loop_ages(records, today, 10), lambda: analytics.age_distribution(today, 10)),
+        ("upcoming 7 days", lambda: book.upcoming_birthdays(7), lambda: analytics.upcoming(today, 7)),
+        (
+            "next 30 days",
+            lambda: loop_between(records, today, today + timedelta(days=30)),
+            lambda: analytics.between(today, today + timedelta(days=30)),
+        ),
+        ("weeks", lambda: loop_weeks(records, today.year), lambda: analytics.week_histogram(today.year)),
+        ("weeks next year", lambda: loop_weeks(records, today.year + 1), lambda: analytics.week_histogram(today.year + 1)),
+    ]
+    for name, loop, vectorized in cases:
+        vectorized_ms, result = timed(vectorized, args.repeat)
+        loop_ms, expected = timed(loop)
+        print(
+            f"{name:>16}: {vectorized_ms:9.2f} ms, loop {loop_ms:9.2f} ms ({loop_ms / vectorized_ms:6.1f}x)"
+            f"{'' if result == expected else '  DIFFERENT RESULTS'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare opening the pickled snapshot with opening the columnar snapshot.
+
+Run from the project root:
+
+    python -m benchmarks.columnar_startup --size 100000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def measure(mode: str, filename: str) -> dict:
+    """Open the snapshot in this process and report the time, peak RSS and one lookup."""
+    started = time.perf_counter()
+    if mode == "pickle":
+        from main import load_data
+
+        book, _ = load_data(filename)
+    else:
+        from fields.address_book import AddressBook
+        from storage.columnar import ColumnarSnapshot
+
+        book = AddressBook(store=ColumnarSnapshot(filename))
+    opened = time.perf_counter()
+    name = next(iter(book))
+    book.find(name)
+    found = time.perf_counter()
+
+    return {
+        "mode": mode,
+        "open_ms": (opened - started) * 1000,
+        "first_find_ms": (found - opened) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Get the peak RSS of this process."""
+    try:
+        # unlike ru_maxrss, VmHWM is not inherited from the parent process on Linux
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    from benchmarks.datagen import generate_book
+    from fields.notes import Notes
+    from main import save_data
+    from storage.columnar import convert_pickle
+
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_filename = os.path.join(directory, "addressbook.pkl")
+        columnar_filename = os.path.join(directory, "addressbook.snap")
+        save_data(generate_book(args.size), Notes(), pickle_filename)
+        convert_pickle(pickle_filename, columnar_filename)
+
+        print(f"{args.size} contacts, pickle {os.path.getsize(pickle_filename) / 2 ** 20:.1f} MB, "
+              f"columnar {os.path.getsize(columnar_filename) / 2 ** 20:.1f} MB")
+        for mode, filename in (("pickle", pickle_filename), ("columnar", columnar_filename)):
+            # every mode runs in a fresh process to get its own peak RSS
+            output = subprocess.check_output([sys.executable, "-m", "benchmarks.columnar_startup", "--child", mode, filename])
+            result = json.loads(output)
+            print(f"{mode:>8}: open {result['open_ms']:9.1f} ms, first find {result['first_find_ms']:6.2f} ms, "
+                  f"peak RSS {result['peak_rss_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
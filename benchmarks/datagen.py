@@ -0,0 +1,65 @@
+import random
+from datetime import date, timedelta
+from typing import Iterator
+
+from fields.address_book import AddressBook
+from fields.birthday import format_date
+from fields.notes import Note, Notes
+from fields.record import Record
+
+FIRST_NAMES = ["Olena", "Taras", "Iryna", "Andrii", "Maria", "Oleh", "Sofiia", "Dmytro", "Anna", "Bohdan"]
+STREETS = ["Khreshchatyk", "Shevchenka", "Franka", "Lesi Ukrainky", "Sadova", "Hrushevskoho"]
+CITIES = ["Kyiv", "Lviv", "Odesa", "Kharkiv", "Dnipro"]
+TAGS = ["work", "family", "friends", "gym", "school", "travel", "doctor", "music"]
+WORDS = [
+    "call", "meeting", "buy", "book", "tickets", "birthday", "gift", "project", "report", "plan",
+    "doctor", "visit", "pay", "bills", "recipe", "borshch", "trip", "Lviv", "train", "remember",
+]
+
+
+def generate_contacts(size: int, seed: int = 42) -> Iterator[dict]:
+    """Generate `size` random but reproducible contacts in the `Record.to_dict()` format."""
+    rng = random.Random(seed)
+    first_day = date(1950, 1, 1)
+    for index in range(size):
+        name = f"{rng.choice(FIRST_NAMES)}{index}"
+        contact = {"name": name, "phones": [], "email": None, "address": None, "birthday": None, "tags": []}
+        for _ in range(rng.randint(1, 3)):
+            contact["phones"].append("0" + "".join(rng.choice("0123456789") for _ in range(9)))
+        if rng.random() < 0.8:
+            contact["email"] = f"{name.lower()}@example.com"
+        if rng.random() < 0.6:
+            contact["address"] = f"{rng.randint(1, 200)} {rng.choice(STREETS)} St, {rng.choice(CITIES)}"
+        if rng.random() < 0.9:
+            birthday = first_day + timedelta(days=rng.randint(0, 365 * 55))
+            contact["birthday"] = format_date(birthday)
+        if rng.random() < 0.7:
+            contact["tags"] = rng.sample(TAGS, rng.randint(1, 3))
+        yield contact
+
+
+def generate_book(size: int, seed: int = 42) -> AddressBook:
+    """Generate the address book with `size` random but reproducible contacts."""
+    book = AddressBook()
+    for contact in generate_contacts(size, seed):
+        book.add(Record.from_dict(contact))
+    return book
+
+
+def generate_notes(size: int, seed: int = 42) -> Iterator[dict]:
+    """Generate `size` random but reproducible notes in the `Note.to_dict()` format."""
+    rng = random.Random(seed)
+    for index in range(size):
+        title = f"{' '.join(rng.sample(WORDS, rng.randint(1, 3))).capitalize()} {index}"
+        content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 25)))
+        tags = rng.sample(TAGS, rng.randint(1, 2)) if rng.random() < 0.6 else []
+        yield {"title": title, "content": content, "tags": tags}
+
+
+def generate_collections(contacts: int, notes: int, seed: int = 42) -> tuple[AddressBook, Notes]:
+    """Generate the address book and the notes with random but reproducible contents."""
+    book = generate_book(contacts, seed)
+    collection = Notes()
+    for note in generate_notes(notes, seed):
+        collection.add(Note.from_dict(note))
+    return book, collection
@@ -0,0 +1,67 @@
+"""Compare the memory taken by the slot-based contacts with the former dict-based ones.
+
+Run from the project root:
+
+    python -m benchmarks.entity_memory --sizes 10000 100000
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.datagen import generate_contacts
+from fields.record import Record
+
+
+class DictField:
+    """The fields as they were before, every one with its own `__dict__`."""
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+class DictBirthday(DictField):
+    def __init__(self, value: str) -> None:
+        self.date = datetime.strptime(value, "%d.%m.%Y")
+        super().__init__(value)
+
+
+class DictRecord:
+    """The record as it was before the slots were added."""
+
+    def __init__(self, contact: dict) -> None:
+        self.name = DictField(contact["name"])
+        self.phones = [DictField(phone) for phone in contact["phones"]]
+        self.address = DictField(contact["address"]) if contact["address"] else None
+        self.email = DictField(contact["email"]) if contact["email"] else None
+        self.tags = [DictField(tag) for tag in contact["tags"]]
+        self.birthday = DictBirthday(contact["birthday"]) if contact["birthday"] else None
+        self._listeners = []
+        self._dirty = True
+
+
+def bytes_per_contact(make, size: int) -> float:
+    """Build `size` contacts with `make` and get the memory they keep, strings included."""
+    gc.collect()
+    tracemalloc.start()
+    contacts = [make(contact) for contact in generate_contacts(size)]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del contacts
+    return allocated / size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        before = bytes_per_contact(DictRecord, size)
+        after = bytes_per_contact(Record.from_dict, size)
+        print(f"{size} contacts: dict-based {before:.0f} B/contact, slot-based {after:.0f} B/contact "
+              f"({(1 - after / before) * 100:.0f}% less)")
+
+
+if __name__ == "__main__":
+    main()
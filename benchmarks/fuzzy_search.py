@@ -0,0 +1,61 @@
+"""Compare the fuzzy top-k search with the substring search and with sorting all fuzzy matches.
+
+Run from the project root:
+
+    python -m benchmarks.fuzzy_search --sizes 10000 100000 --limit 10
+"""
+import argparse
+import re
+import time
+from operator import itemgetter
+
+from pfzy import fzy_scorer
+
+from benchmarks.datagen import generate_book
+from fields.address_book import AddressBook
+
+QUERIES = ["olena1", "olna12", "tars 5@", "kyiv", "0501", "shvchnk", "nobody"]
+
+
+def fuzzy_sorted(book: AddressBook, query: str, limit: int) -> list[str]:
+    """Score every entity like `fuzzy_search()` but sort all the matches instead of keeping a heap."""
+    index = book._fuzzy_index()
+    pattern = re.compile("[^\n]*?".join(map(re.escape, query)))
+    scores = [(index._score(fzy_scorer, query, pattern, text), key) for key, (_, text) in index._entries.items()]
+    scores = [item for item in scores if item[0] > float("-inf")]
+    return [key for _, key in sorted(scores, key=itemgetter(0), reverse=True)[:limit]]
+
+
+def timed(func, repeat: int) -> tuple[float, object]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        book = generate_book(size)
+        book._ngram_index()
+        started = time.perf_counter()
+        book._fuzzy_index()
+        print(f"{size} contacts, fuzzy texts built in {(time.perf_counter() - started) * 1000:.0f} ms")
+        for query in QUERIES:
+            search_ms, found = timed(lambda: book.search(query), args.repeat)
+            fuzzy_ms, best = timed(lambda: book.fuzzy_search(query, limit=args.limit), args.repeat)
+            sorted_ms, expected = timed(lambda: fuzzy_sorted(book, query, args.limit), 1)
+            assert [record.name.value for record in best] == expected, f"different results for '{query}'"
+            print(
+                f"  {query!r:>10}: substring {len(found):6} found {search_ms:8.2f} ms, "
+                f"fuzzy top {len(best):3} {fuzzy_ms:8.2f} ms, fuzzy full sort {sorted_ms:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the serial search with the parallel search over worker processes.
+
+Every query is timed without the search cache, and the parallel results are
+checked to be the same entities in the same order as the serial ones.
+
+Run from the project root:
+
+    python -m benchmarks.parallel_search --size 1000000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import time
+
+from benchmarks.datagen import generate_collections
+
+CONTACT_QUERIES = [("ole", ""), ("", "work"), ("a", ""), ("05", ""), ("nobody", "")]
+NOTE_QUERIES = [("plan", ""), ("", "work"), ("e", ""), ("nobody", "")]
+
+
+def timed_search(collection, query: str, tag: str, sort: str, repeat: int) -> tuple[float, tuple]:
+    """Get the best ms of the search, run as if the collection changed before every call."""
+    best = float("inf")
+    for _ in range(repeat):
+        collection._generation += 1
+        started = time.perf_counter()
+        result = collection.search(query, tag, sort)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200_000, help="the number of contacts and of notes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    book, notes = generate_collections(args.size, args.size, args.seed)
+    print(f"{args.size} contacts and notes, {os.cpu_count()} CPUs")
+    for collection, queries, sort in ((book, CONTACT_QUERIES, "name"), (notes, NOTE_QUERIES, "title")):
+        serial = {query: timed_search(collection, *query, sort, args.repeat) for query in queries}
+        for workers in args.workers:
+            started = time.perf_counter()
+            collection.start_parallel_search(workers)
+            start_s = time.perf_counter() - started
+            print(f"{type(collection).__name__}, {workers} workers started in {start_s:.1f} s:")
+            for query in queries:
+                serial_ms, expected = serial[query]
+                parallel_ms, result = timed_search(collection, *query, sort, args.repeat)
+                same = len(result) == len(expected) and all(a is b for a, b in zip(result, expected))
+                print(
+                    f"  {query!r:>16}: {len(expected):8} found, serial {serial_ms:9.2f} ms, "
+                    f"parallel {parallel_ms:9.2f} ms ({serial_ms / parallel_ms:5.2f}x){'' if same else '  DIFFERENT RESULTS'}"
+                )
+            collection.stop_parallel_search()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Compare the trigram index search with the full scan over the contacts.
+
+Run from the project root:
+
+    python -m benchmarks.search_index --sizes 1000 10000 100000
+"""
+import argparse
+import time
+
+from benchmarks.datagen import generate_book
+from fields.address_book import AddressBook
+from fields.base_collection import BaseCollection
+
+QUERIES = ["olena1", "example", "kyiv", "0501", "12.199", "shevchenka st", "nobody"]
+
+
+def scan(book: AddressBook, query: str) -> list[str]:
+    """Search without the index, like before it was added."""
+    candidates = BaseCollection._candidates(book, query)
+    return sorted(record.name.value for record in candidates if book._match_entity(record, query))
+
+
+def timed(func, repeat: int) -> tuple[float, object]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        book = generate_book(size)
+        started = time.perf_counter()
+        book._ngram_index()
+        print(f"{size} contacts, index built in {(time.perf_counter() - started) * 1000:.0f} ms")
+        for query in QUERIES:
+            scan_ms, expected = timed(lambda: scan(book, query), args.repeat)
+            index_ms, found = timed(lambda: [record.name.value for record in book.search(query)], args.repeat)
+            assert sorted(found) == expected, f"different results for '{query}'"
+            print(f"  {query!r:>16}: {len(found):6} found, scan {scan_ms:8.2f} ms, index {index_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Load test the HTTP/JSON server with concurrent keep-alive clients.
+
+Starts `server.py` on a generated address book in a temporary directory and
+reports the requests per second and the latency percentiles per request kind.
+Run from the project root:
+
+    python -m benchmarks.server_load --size 10000 --clients 32 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+from benchmarks.datagen import generate_contacts
+from fields.address_book import AddressBook
+from fields.notes import Notes
+from fields.record import Record
+from storage import Journal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_requests(contacts: list[dict], count: int, writes: float, seed: int = 7) -> list[tuple[str, str, str, dict | None]]:
+    """Get the (kind, method, path, body) requests, `writes` of them changing contacts or adding notes."""
+    rng = random.Random(seed)
+    requests = []
+    for index in range(count):
+        contact = rng.choice(contacts)
+        if rng.random() < writes:
+            if rng.random() < 0.5:
+                requests.append(("edit", "PATCH", f"/contacts/{quote(contact['name'])}", {"email": f"load{index}@example.com"}))
+            else:
+                requests.append(("add-note", "POST", "/notes", {"title": f"Load note {index}", "content": "load test"}))
+            continue
+        kind = rng.choices(["find", "search", "phone", "birthdays"], weights=[50, 30, 15, 5])[0]
+        if kind == "find":
+            requests.append((kind, "GET", f"/contacts/{quote(contact['name'])}", None))
+        elif kind == "search":
+            requests.append((kind, "GET", f"/contacts?query={quote(contact['name'][:-1].lower())}&limit=20", None))
+        elif kind == "phone":
+            requests.append((kind, "GET", f"/phones/{contact['phones'][0]}", None))
+        else:
+            requests.append((kind, "GET", "/birthdays?days=7", None))
+    return requests
+
+
+async def send(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, path: str, body: dict | None) -> int:
+    """Send the request on the keep-alive connection and read the response, return the status."""
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    length = next(int(line.split(":")[1]) for line in header_lines if line.lower().startswith("content-length:"))
+    await reader.readexactly(length)
+    return int(status_line.split(" ")[1])
+
+
+async def run_clients(port: int, requests: list, clients: int) -> tuple[float, dict[str, list[float]], int]:
+    """Send the requests from `clients` connections, return the seconds, latencies per kind and failures."""
+    latencies: dict[str, list[float]] = {}
+    failed = 0
+    pending = iter(requests)
+
+    async def client() -> None:
+        nonlocal failed
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for kind, method, path, body in pending:
+            started = time.perf_counter()
+            status = await send(reader, writer, method, path, body)
+            latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+            failed += status != 200
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - started, latencies, failed
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def wait_for_server(port: int, process: subprocess.Popen) -> None:
+    while True:
+        if process.poll() is not None:
+            sys.exit("The server exited before accepting connections.")
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.1)
+            continue
+        await send(reader, writer, "GET", "/stats", None)
+        writer.close()
+        return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10_000, help="contacts in the address book")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--writes", type=float, default=0.1, help="fraction of the requests changing the data")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    contacts = list(generate_contacts(args.size))
+    book = AddressBook()
+    for contact in contacts:
+        book.add(Record.from_dict(contact))
+    requests = make_requests(contacts, args.requests, args.writes)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "addressbook.pkl")
+        Journal(filename).compact(book, Notes())
+        server = subprocess.Popen(
+            [sys.executable, "server.py", "--port", str(args.port), "--file", filename],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            asyncio.run(wait_for_server(args.port, server))
+            seconds, latencies, failed = asyncio.run(run_clients(args.port, requests, args.clients))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(
+        f"{args.size} contacts, {args.clients} clients: {len(requests)} requests in {seconds:.2f} s, "
+        f"{len(requests) / seconds:.0f} requests/s, {failed} failed"
+    )
+    everything = [latency for values in latencies.values() for latency in values]
+    for kind, values in sorted(latencies.items()) + [("all", everything)]:
+        print(
+            f"  {kind:>10}: {len(values):6} requests, p50 {percentile(values, 0.5):7.2f} ms, "
+            f"p99 {percentile(values, 0.99):7.2f} ms, max {max(values):7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Time the cold start of the assistant and fail when it goes over the budget.
+
+Three things are measured, each in fresh processes in an empty directory:
+
+- the `-X importtime` breakdown of `import main`, summed up by top-level package;
+- the time from starting `main.py` to the first menu, read through a pseudo
+  terminal as the menu needs one (skipped where there is no `pty` module);
+- the time of a one-shot `main.py --batch` run with no commands.
+
+The best of `--repeat` runs is compared with the budget, and the heavy
+modules used by the menus and tables must not be imported along with `main`.
+
+Run from the project root:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --menu-budget-ms 600 --batch-budget-ms 300 --output startup.json
+"""
+import argparse
+import json
+import os
+import select
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+# the modules imported on first use only, see `main.py`
+LAZY_MODULES = ("InquirerPy", "prompt_toolkit", "tabulate", "pfzy", "sqlite3")
+MENU_PROMPT = b"Choose an option"
+
+
+def child_env() -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT, TRIATEAMO_STATS="0")
+    env.pop("TRIATEAMO_STORAGE", None)
+    return env
+
+
+def import_breakdown(directory: str) -> tuple[float, dict[str, float]]:
+    """Get the time of `import main` and the own import time of the top-level packages, in ms."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=directory, env=child_env(), capture_output=True, text=True, check=True,
+    ).stderr
+    packages = defaultdict(float)
+    total_ms = 0.0
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not self_us.isdigit():
+            # the header line
+            continue
+        packages[name.split(".")[0]] += int(self_us) / 1000
+        if name == "main":
+            total_ms = int(cumulative_us) / 1000
+    return total_ms, dict(packages)
+
+
+def imported_lazy_modules(directory: str) -> list[str]:
+    """Get the modules of `LAZY_MODULES` imported along with `main`."""
+    code = f"import sys, main; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=directory, env=child_env(), capture_output=True, text=True, check=True,
+    ).stdout
+    return output.split()
+
+
+def time_to_menu(directory: str, timeout: float = 30.0) -> float | None:
+    """Start `main.py` in a pseudo terminal and get the ms until the menu is shown, None without `pty`."""
+    try:
+        import pty
+    except ImportError:
+        return None
+
+    master, slave = pty.openpty()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, MAIN], cwd=directory, env=child_env(), stdin=slave, stdout=slave, stderr=slave,
+    )
+    os.close(slave)
+    output = b""
+    try:
+        while MENU_PROMPT not in output:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"No menu within {timeout} s, the output was: {output[-500:]!r}")
+            ready, _, _ = select.select([master], [], [], 0.1)
+            if ready:
+                try:
+                    output += os.read(master, 65536)
+                except OSError:
+                    # the terminal is closed when the process exits
+                    raise RuntimeError(f"main.py exited before the menu, the output was: {output[-500:]!r}")
+        return (time.perf_counter() - started) * 1000
+    finally:
+        process.kill()
+        process.wait()
+        os.close(master)
+
+
+def time_batch(directory: str) -> float:
+    """Get the ms of a `main.py --batch` run reading no commands."""
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, MAIN, "--batch", "-"], cwd=directory, env=child_env(), input=b"", capture_output=True, check=True,
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="the number of packages shown in the breakdown")
+    parser.add_argument("--import-budget-ms", type=float, default=180.0, help="the budget of `import main`")
+    parser.add_argument("--menu-budget-ms", type=float, default=450.0, help="the budget of the time to the first menu")
+    parser.add_argument("--batch-budget-ms", type=float, default=220.0, help="the budget of an empty batch run")
+    parser.add_argument("--output", help="the JSON file to write the results to")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        lazy = imported_lazy_modules(directory)
+        if lazy:
+            failures.append(f"import main imports {', '.join(lazy)}, which should be imported on first use")
+
+        breakdowns = [import_breakdown(directory) for _ in range(args.repeat)]
+        import_ms, packages = min(breakdowns, key=lambda breakdown: breakdown[0])
+        menu_times = [time_to_menu(directory) for _ in range(args.repeat)]
+        menu_ms = None if None in menu_times else min(menu_times)
+        batch_ms = min(time_batch(directory) for _ in range(args.repeat))
+
+    print(f"import main: {import_ms:8.1f} ms (budget {args.import_budget_ms:.0f} ms), own import time by package:")
+    for name, package_ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:>24}: {package_ms:8.1f} ms")
+    if menu_ms is None:
+        print("first menu: skipped, no pseudo terminals on this platform")
+    else:
+        print(f"first menu: {menu_ms:8.1f} ms (budget {args.menu_budget_ms:.0f} ms)")
+    print(f"empty batch: {batch_ms:7.1f} ms (budget {args.batch_budget_ms:.0f} ms)")
+
+    for name, measured_ms, budget_ms in (
+        ("import main", import_ms, args.import_budget_ms),
+        ("first menu", menu_ms, args.menu_budget_ms),
+        ("empty batch", batch_ms, args.batch_budget_ms),
+    ):
+        if measured_ms is not None and measured_ms > budget_ms:
+            failures.append(f"{name} takes {measured_ms:.0f} ms, over the budget of {budget_ms:.0f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({
+                "python": sys.version.split()[0],
+                "import_ms": round(import_ms, 1),
+                "menu_ms": round(menu_ms, 1) if menu_ms is not None else None,
+                "batch_ms": round(batch_ms, 1),
+                "packages_ms": {name: round(package_ms, 2) for name, package_ms in sorted(packages.items())},
+                "lazy_modules_imported": lazy,
+            }, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if failures:
+        sys.exit("Over the startup budget:\n" + "\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
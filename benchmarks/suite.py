@@ -0,0 +1,219 @@
+"""Time the core operations of the address book and the notes at scale.
+
+Every size runs in a fresh process on seeded random contacts and notes.
+Each case is timed on its first call, which builds the indexes it needs,
+and on `--repeat` later calls; the peak memory it allocates is traced on
+another first call. The results are written to a JSON file, pass the file
+of an earlier run to `--compare` to see the changes and fail on regressions.
+
+Run from the project root:
+
+    python -m benchmarks.suite --sizes 10000 100000 --output bench.json
+    python -m benchmarks.suite --sizes 10000 100000 --output new.json --compare bench.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable
+
+from benchmarks.columnar_startup import peak_rss_mb
+
+# the indexes the collections build on first use
+INDEXES = ("_tags", "_fuzzy", "_ngrams", "_phones", "_birthdays", "_names", "_folded")
+
+
+def drop_indexes(*collections) -> None:
+    """Forget the indexes built on first use, so that the next call builds them again."""
+    for collection in collections:
+        for name in INDEXES:
+            if hasattr(collection, name):
+                setattr(collection, name, None)
+
+
+def uncached(collection, search: Callable[[], object]) -> Callable[[], object]:
+    """Run the search as if the collection changed, so that it is not answered from the search cache."""
+
+    def run():
+        collection._generation += 1
+        return search()
+
+    return run
+
+
+def make_cases(book, notes, filename: str, seed: int) -> dict[str, Callable[[], object]]:
+    """Get the operations to time by their names, the saved file is loaded after it is written."""
+    from prompt_toolkit.completion import CompleteEvent
+    from prompt_toolkit.document import Document
+
+    from main import load_data, save_data
+    from utils.suggest_input import NameCompleter
+
+    rng = random.Random(seed)
+    titles = rng.sample(list(notes.notes), min(1000, len(notes.notes)))
+    records = book.get_all()[:1000]
+    return {
+        "save_data": lambda: save_data(book, notes, filename),
+        "load_data": lambda: load_data(filename),
+        "search_contacts": uncached(book, lambda: book.search("ole")),
+        "search_contacts_tag": uncached(book, lambda: book.search("ole", "work")),
+        "search_contacts_cached": lambda: book.search("ole"),
+        "search_notes": uncached(notes, lambda: notes.search("plan", sort="title")),
+        "search_notes_tag": uncached(notes, lambda: notes.search("plan", "work", "title")),
+        "search_notes_cached": lambda: notes.search("plan", sort="title"),
+        "upcoming_birthdays": lambda: book.get_upcoming_birthdays(7),
+        "find_note_x1000": lambda: [notes.find_note(title) for title in titles],
+        "find_note_ignore_case_x1000": lambda: [notes.find_note(title.lower(), True) for title in titles],
+        "render_table_1000": lambda: book.render_table(records, "No contacts found."),
+        "name_completer": lambda: list(NameCompleter(book).get_completions(Document("Ol"), CompleteEvent())),
+    }
+
+
+def measure(func: Callable[[], object], reset: Callable[[], None], repeat: int) -> dict:
+    """Time the first call and the next `repeat` calls, and trace the peak memory of a first call."""
+    reset()
+    gc.collect()
+    started = time.perf_counter()
+    func()
+    first_ms = (time.perf_counter() - started) * 1000
+
+    reset()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "first_ms": round(first_ms, 3),
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(min(times), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_size(size: int, notes_count: int, seed: int, repeat: int) -> dict:
+    """Run all cases on `size` contacts and `notes_count` notes in this process."""
+    from benchmarks.datagen import generate_collections
+
+    started = time.perf_counter()
+    book, notes = generate_collections(size, notes_count, seed)
+    generate_ms = (time.perf_counter() - started) * 1000
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        cases = make_cases(book, notes, os.path.join(directory, "addressbook.pkl"), seed)
+        for name, func in cases.items():
+            results[name] = measure(func, lambda: drop_indexes(book, notes), repeat)
+    return {
+        "contacts": size,
+        "notes": notes_count,
+        "generate_ms": round(generate_ms, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "cases": results,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """Print the changes of the best times and peak memory, return the regressions.
+
+    The best of the repeated calls is compared, it varies less between the
+    runs than the median.
+    """
+    regressions = []
+    for size, run in new["sizes"].items():
+        old_run = old["sizes"].get(size)
+        if old_run is None:
+            continue
+        print(f"{size} contacts, compared with {old.get('commit') or 'the earlier run'}:")
+        for name, result in run["cases"].items():
+            before = old_run["cases"].get(name)
+            if before is None:
+                continue
+            time_ratio = result["min_ms"] / before["min_ms"] if before["min_ms"] else 1.0
+            memory_ratio = result["peak_kb"] / before["peak_kb"] if before["peak_kb"] else 1.0
+            slower = time_ratio > threshold and result["min_ms"] - before["min_ms"] > min_delta_ms
+            marker = "  REGRESSION" if slower else ""
+            print(
+                f"  {name:>28}: {before['min_ms']:10.2f} -> {result['min_ms']:10.2f} ms ({time_ratio:5.2f}x), "
+                f"peak {before['peak_kb']:10.0f} -> {result['peak_kb']:10.0f} KB ({memory_ratio:5.2f}x){marker}"
+            )
+            if slower:
+                regressions.append(f"{name} at {size} contacts is {time_ratio:.2f}x slower")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="numbers of contacts, e.g. 1000000")
+    parser.add_argument("--notes-ratio", type=float, default=1.0, help="notes per contact")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench.json", help="the JSON file to write the results to")
+    parser.add_argument("--compare", metavar="FILE", help="the results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="the slowdown counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_size(args.child, int(args.child * args.notes_ratio), args.seed, args.repeat)))
+        return
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    for size in args.sizes:
+        # every size runs in a fresh process to get its own peak RSS
+        output = subprocess.check_output([
+            sys.executable, "-m", "benchmarks.suite", "--child", str(size),
+            "--notes-ratio", str(args.notes_ratio), "--seed", str(args.seed), "--repeat", str(args.repeat),
+        ])
+        run = report["sizes"][str(size)] = json.loads(output)
+        print(f"{size} contacts and {run['notes']} notes, generated in {run['generate_ms'] / 1000:.1f} s, peak RSS {run['peak_rss_mb']:.0f} MB")
+        for name, result in run["cases"].items():
+            print(
+                f"  {name:>28}: first {result['first_ms']:10.2f} ms, median {result['median_ms']:10.2f} ms, "
+                f"peak {result['peak_kb']:10.0f} KB"
+            )
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(json.load(file), report, args.threshold, args.min_delta_ms)
+        if regressions:
+            sys.exit("Regressions:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
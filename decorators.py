@@ -1,10 +1,18 @@
+from functools import wraps
+
 from colorama import Fore
 
+from instrumentation import measured
+
 
 def input_error(func):
+    # the errors are recorded before they are turned into messages
+    measured_func = measured(func)
+
+    @wraps(func)
     def inner(*args, **kwargs):
         try:
-            return func(*args, **kwargs)
+            return measured_func(*args, **kwargs)
         except ValueError as e:
             return Fore.RED + str(e)
         except KeyError as e:
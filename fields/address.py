@@ -4,6 +4,8 @@ from .base_field import Field
 class Address(Field):
     """A class for a field to store a physical address."""
 
+    __slots__ = ()
+
     def __init__(self, value):
         if not self._is_valid_address(value):
             raise ValueError("Invalid address format.")
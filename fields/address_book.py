@@ -1,8 +1,16 @@
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from collections import UserDict
-from typing import Optional
-from tabulate import tabulate
+from typing import Iterable, Iterator, Optional
+from instrumentation import measured_method
 
+from .birthday import format_date
+from .birthday_analytics import BirthdayAnalytics
+from .birthday_index import BirthdayIndex, day_window
+from .fuzzy_index import lowered
+from .name_index import NameIndex
+from .name import Name
+from .ngram_index import NGramIndex
+from .phone_index import PhoneIndex
 from .record import Record
 from .base_collection import BaseCollection
 
@@ -10,50 +18,220 @@ from .base_collection import BaseCollection
 class AddressBook(UserDict, BaseCollection[Record]):
     """Implementation of basic version of the address book."""
 
+    entity_class = Record
+    table_headers = ["Name", "Phone", "Email", "Address", "Birthday", "Tags"]
+    _runtime_state = BaseCollection._runtime_state + ("_ngrams", "_phones", "_birthdays", "_names", "_analytics")
+
+    def __init__(self, *args, store=None, **kwargs) -> None:
+        """Create the address book kept in memory or, if `store` is passed, in the storage engine."""
+        self._init_state()
+        self._store = store
+        super().__init__(*args, **kwargs)
+        if store is not None:
+            self.data = store.record_mapping(on_load=self._attach)
+
+    def _init_state(self) -> None:
+        super()._init_state()
+        # built on first use, see `_ngram_index()`, `_phone_index()`, `_birthday_index()`, `_name_index()`
+        # and `birthday_analytics()`
+        self._ngrams: NGramIndex | None = None
+        self._phones: PhoneIndex | None = None
+        self._birthdays: BirthdayIndex | None = None
+        self._names: NameIndex | None = None
+        self._analytics: BirthdayAnalytics | None = None
+
     def add(self, record: Record) -> None:
         """Add the record to the address book."""
         if record.name.value in self.data:
             raise KeyError(f"The record with name '{record.name.value}' already exists.")
 
         self.data[record.name.value] = record
+        self._attach(record)
+        self._index(record)
+        self._mark_dirty(record.name.value)
+        self._emit("add", record.name.value, record)
 
     def find(self, name: str) -> Optional[Record]:
         """Find the record by name."""
         return self.data.get(name)
 
+    def find_entity(self, key: str) -> Optional[Record]:
+        return self.find(key)
+
     def delete(self, name: str) -> None:
         """Delete the record by name."""
         if name not in self.data:
             raise KeyError(f"The record with name '{name}' is not found.")
 
-        del self.data[name]
+        self._detach(self.data.pop(name))
+        self._unindex(name)
+        self._mark_deleted(name)
+        self._emit("delete", name)
 
-    def get_upcoming_birthdays(self):
-        today = datetime.today().date()
-        upcoming_birthdays = []
+    def _entity_changed(self, record: Record, event: str, args: tuple, key: str) -> None:
+        if event == "change_name" and record.name.value != key:
+            if record.name.value in self.data:
+                record.name = Name(key)
+                raise KeyError(f"The record with name '{args[0]}' already exists.")
+            self.data[record.name.value] = self.data.pop(key)
+        if getattr(self, "_store", None) is not None:
+            self._store.save_record(record)
+        super()._entity_changed(record, event, args, key)
 
-        for user in self.data.values():
-            if user.birthday:
-                # Convert the birthday string to a datetime.date object
-                birthday_date = datetime.strptime(user.birthday.value, "%d.%m.%Y").date()
-                # Set the year to the current year to be able to compare with the current date
-                birthday_this_year = birthday_date.replace(year=today.year)
+    def _index(self, record: Record, old_key: str | None = None) -> None:
+        super()._index(record, old_key)
+        if self._ngrams is not None:
+            self._ngrams.remove(record.name.value if old_key is None else old_key)
+            self._ngrams.add(record.name.value, self._search_texts(record))
+        if self._phones is not None:
+            self._phones.update(record.name.value, [phone.value for phone in record.phones], old_key)
+        if self._birthdays is not None:
+            self._birthdays.update(record.name.value, record.birthday.date if record.birthday else None, old_key)
+        if self._analytics is not None:
+            self._analytics.update(record.name.value, record.birthday.ordinal if record.birthday else None, old_key)
+        if self._names is not None and old_key != record.name.value:
+            if old_key is not None:
+                self._names.remove(old_key)
+            self._names.add(record.name.value)
 
-                # If the birthday has passed this year, move it to next year
-                if birthday_this_year < today:
-                    birthday_this_year = birthday_this_year.replace(year=today.year + 1)
+    def _unindex(self, name: str) -> None:
+        super()._unindex(name)
+        if self._ngrams is not None:
+            self._ngrams.remove(name)
+        if self._phones is not None:
+            self._phones.remove(name)
+        if self._birthdays is not None:
+            self._birthdays.remove(name)
+        if self._names is not None:
+            self._names.remove(name)
+        if self._analytics is not None:
+            self._analytics.remove(name)
 
-                # Get the number of days until the next birthday
-                days_until_birthday = (birthday_this_year - today).days
+    @measured_method
+    def find_by_phone(self, number: str, prefix: bool = False, limit: int | None = None) -> list[Record]:
+        """Find the records having the phone number or, with `prefix`, a number starting with it."""
+        if getattr(self, "_store", None) is not None:
+            names = self._store.phone_names(number, prefix)[:limit]
+        elif prefix:
+            names = self._phone_index().find_prefix(number, limit)
+        else:
+            names = self._phone_index().find(number)[:limit]
+        return [self.data[name] for name in names]
 
-                if 0 <= days_until_birthday <= 7:
-                    if birthday_this_year.weekday() >= 5:
-                        birthday_this_year += timedelta(days=(7 - birthday_this_year.weekday()))
+    @measured_method
+    def complete_name(self, prefix: str, limit: int = 50) -> list[str]:
+        """Get at most `limit` names starting with the prefix, ignoring the case."""
+        return self._name_index().complete(prefix, limit)
 
-                    upcoming_birthdays.append(f"{user.name.value}: {birthday_this_year.strftime('%d.%m.%Y')}")
+    def _name_index(self) -> NameIndex:
+        """Get the sorted names for the completion, building the index on first use."""
+        if self._names is None:
+            self._names = NameIndex()
+            # iterating the names does not load the records kept in a store
+            self._names.build(self.data)
+        return self._names
+
+    def _phone_index(self) -> PhoneIndex:
+        """Get the reverse index of the phone numbers, building it on first use."""
+        if self._phones is None:
+            self._phones = PhoneIndex()
+            self._phones.build(
+                (record.name.value, [phone.value for phone in record.phones]) for record in self.data.values()
+            )
+        return self._phones
+
+    def _candidates(self, query: str, tag: str = "") -> list[Record]:
+        if getattr(self, "_store", None) is not None:
+            return [self.data[name] for name in self._store.search_records(query, tag)]
+
+        names = self._ngram_index().candidates(query) if query else None
+        if names is None:
+            return super()._candidates(query, tag)
+        if tag:
+            # start from the shorter of the tag and the trigram posting lists
+            tagged = self._tag_index().keys(tag)
+            if len(tagged) < len(names):
+                return [self.data[name] for name in tagged]
+        return [self.data[name] for name in names]
+
+    def count_tag(self, tag: str) -> int:
+        if getattr(self, "_store", None) is not None:
+            return len(self._store.search_records("", tag))
+        return super().count_tag(tag)
+
+    def _ngram_index(self) -> NGramIndex:
+        """Get the trigram index of the searchable fields, building it on first use."""
+        if self._ngrams is None:
+            self._ngrams = NGramIndex()
+            for record in self.data.values():
+                self._ngrams.add(record.name.value, self._search_texts(record))
+        return self._ngrams
+
+    @staticmethod
+    def _search_texts(record: Record) -> list[str]:
+        """Get the lowercased values `_match_entity()` looks for the query in."""
+        texts = [lowered(record.name.value)]
+        texts += [phone.value for phone in record.phones]
+        if record.email:
+            texts.append(lowered(record.email.value))
+        if record.address:
+            texts.append(lowered(record.address.value))
+        if record.birthday:
+            texts.append(record.birthday.value)
+        return texts
+
+    def _fuzzy_texts(self, record: Record) -> list[str]:
+        return self._search_texts(record)
+
+    def _birthday_candidates(self, start: date, end: date) -> list[Record]:
+        """Get the records with the birthday between the dates."""
+        if getattr(self, "_store", None) is not None:
+            names = self._store.birthday_names(*day_window(start, end))
+        else:
+            names = self._birthday_index().between(start, end)
+        return [self.data[name] for name in names]
+
+    def _birthday_index(self) -> BirthdayIndex:
+        """Get the calendar index of the birthdays, building it on first use."""
+        if self._birthdays is None:
+            self._birthdays = BirthdayIndex()
+            self._birthdays.build(
+                (record.name.value, record.birthday.date) for record in self.data.values() if record.birthday
+            )
+        return self._birthdays
+
+    def birthday_analytics(self) -> BirthdayAnalytics:
+        """Get the birthdays packed for the bulk calendar queries, building them on first use. Needs NumPy."""
+        if self._analytics is None:
+            analytics = BirthdayAnalytics()
+            analytics.build(
+                (record.name.value, record.birthday.ordinal) for record in self.data.values() if record.birthday
+            )
+            self._analytics = analytics
+        return self._analytics
+
+    @measured_method
+    def get_upcoming_birthdays(self, days: int = 7) -> str:
+        """Get the birthdays within the number of days, moving the ones on weekends to Monday."""
+        return "\n".join(f"{name}: {format_date(birthday)}" for birthday, name in self.upcoming_birthdays(days))
+
+    @measured_method
+    def upcoming_birthdays(self, days: int = 7) -> list[tuple[date, str]]:
+        """Get the (date, name) pairs of `get_upcoming_birthdays()` sorted by date."""
+        today = date.today()
+        upcoming_birthdays = []
+
+        for user in self._birthday_candidates(today, today + timedelta(days=days)):
+            birthday = user.birthday.next_date(today)
+            if (birthday - today).days > days:
+                continue
+            if birthday.weekday() >= 5:
+                birthday += timedelta(days=(7 - birthday.weekday()))
+            upcoming_birthdays.append((birthday, user.name.value))
+
+        upcoming_birthdays.sort()
+        return upcoming_birthdays
 
-        return "\n".join(upcoming_birthdays)
-    
     def get_all(self):
         return list(self.data.values())
     
@@ -76,17 +254,21 @@ class AddressBook(UserDict, BaseCollection[Record]):
             return None
         return record
     
+    @measured_method
     def render_table(self, records: list[Record], no_data_str: str) -> str:
+        from tabulate import tabulate
+
         if not records:
             return tabulate([[no_data_str]], tablefmt="grid")
-        table = []
+        return tabulate(list(self.table_rows(records)), headers=self.table_headers, tablefmt="grid")
+
+    def table_rows(self, records: Iterable[Record]) -> Iterator[list[str]]:
+        """Get the table row of each record, one by one."""
         for record in records:
             phones = "; ".join(phone.value for phone in record.phones)
             email = record.email.value if record.email else "N/A"
             address = record.address.value if record.address else "N/A"
-            birthday = record.birthday.date.strftime("%d.%m.%Y") if record.birthday else "N/A"
+            birthday = record.birthday.value if record.birthday else "N/A"
             tags = "; ".join(tag.value for tag in record.tags) if record.tags else "N/A"
 
-            table.append([record.name.value, phones, email, address, birthday, tags])
-
-        return tabulate(table, headers=["Name", "Phone", "Email", "Address", "Birthday", "Tags"], tablefmt="grid")
+            yield [record.name.value, phones, email, address, birthday, tags]
@@ -1,29 +1,320 @@
+import threading
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic, List
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, TypeVar, Generic, List
+from instrumentation import measured_method
 from .base_entity import BaseEntity
+from .fuzzy_index import FuzzyIndex
+from .search_cache import SearchCache
+from .tag_index import TagIndex
+from .tag_registry import registry
+
+if TYPE_CHECKING:
+    from .parallel_search import ParallelSearch
 
 T = TypeVar('T', bound=BaseEntity)
 
+# observer(collection, event, key, args) is called after every change in the collection
+Observer = Callable[["BaseCollection", str, str, tuple], None]
+
+
 class BaseCollection(ABC, Generic[T]):
-    def search(self, query: str, tag: str = "", sort: str = "name", order: str = "asc") -> List[T]:
-        """Get the entities sorted by the passed parameters."""
-        result: List[T] = []
-        for entity in self.get_all():
-            matched = self._match_entity(entity, query.lower(), tag)
-            if matched: 
-                result.append(matched)
-        return sorted(
-            result,
-            key=lambda entity: getattr(entity, sort).value,
-            reverse=(order != "asc"),
-        )
+    # attributes set by `_init_state()` which are not pickled
+    _runtime_state = (
+        "_observers", "_lock", "_dirty", "_deleted", "_merging", "_tags", "_fuzzy", "_generation", "_search_cache",
+        "_parallel",
+    )
+    # the number of searches whose results are kept, see `search()`
+    search_cache_size = 64
+
+    @measured_method
+    def search(self, query: str, tag: str = "", sort: str = "name", order: str = "asc") -> tuple[T, ...]:
+        """Get the entities sorted by the passed parameters.
+
+        The results of the recent searches are cached until the collection
+        changes, so repeating a search or paging through it does not scan the
+        entities again. After `start_parallel_search()` the worker processes
+        search the collection instead.
+        """
+        key = (query, tag, sort, order)
+        generation = self._generation
+        cached = self._search_cache.get(key, generation)
+        if cached is not None:
+            return cached
+
+        if self._parallel is not None:
+            found = self._parallel.search(query, tag, sort, order)
+        else:
+            result: List[T] = []
+            for entity in self._candidates(query.lower(), tag):
+                matched = self._match_entity(entity, query.lower(), tag)
+                if matched:
+                    result.append(matched)
+            result.sort(key=lambda entity: getattr(entity, sort).value, reverse=(order != "asc"))
+            found = tuple(result)
+        self._search_cache.put(key, generation, found)
+        return found
+
+    def start_parallel_search(self, workers: int) -> None:
+        """Search the collection in `workers` processes from now on, each one keeping a shard of it.
+
+        It pays off for the large collections only, starting the workers
+        copies all entities to them.
+        """
+        from .parallel_search import ParallelSearch
+
+        if getattr(self, "_store", None) is not None:
+            raise ValueError("The collection kept in a store is searched by the store.")
+        self.stop_parallel_search()
+        self._parallel = ParallelSearch(self, workers)
+
+    def stop_parallel_search(self) -> None:
+        if self._parallel is not None:
+            self._parallel.close()
+            self._parallel = None
+
+    @property
+    def search_cache_stats(self) -> dict:
+        """The hits and misses of the search results cache."""
+        return self._search_cache.stats
+
+    @measured_method
+    def fuzzy_search(self, query: str, tag: str = "", limit: int = 10) -> List[T]:
+        """Get at most `limit` entities best matching the query, letters may be missing in the query."""
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+        keys = [entity.key for entity in self._candidates("", tag)] if tag else None
+        return [self.find_entity(key) for key in self._fuzzy_index().top(query, limit, keys)]
+
+    def _fuzzy_index(self) -> FuzzyIndex:
+        """Get the lowercased texts for the fuzzy search, building them on first use."""
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex()
+            for entity in self.get_all():
+                self._fuzzy.update(entity.key, self._fuzzy_texts(entity))
+        return self._fuzzy
+
+    @abstractmethod
+    def _fuzzy_texts(self, entity: T) -> list[str]:
+        """Get the lowercased texts of the entity for the fuzzy search, the main one first. Must be implemented by the child class."""
+        pass
 
     @abstractmethod
     def get_all(self) -> List[T]:
         """Get all entities. Must be implemented by the child class."""
         pass
 
+    def _candidates(self, query: str, tag: str = "") -> List[T]:
+        """Get the entities which may match the lowercased query, `_match_entity()` checks them."""
+        if tag:
+            return self._tag_index().entities(tag)
+        return self.get_all()
+
+    def count_tag(self, tag: str) -> int:
+        """Get the number of entities with the tag."""
+        return self._tag_index().count(tag)
+
+    def _tag_index(self) -> TagIndex[T]:
+        """Get the index of the entity tags, building it on first use."""
+        if self._tags is None:
+            self._tags = TagIndex()
+            for entity in self.get_all():
+                self._tags.update(entity)
+        return self._tags
+
+    def _index(self, entity: T, old_key: str | None = None) -> None:
+        """Update the indexes for the added or changed entity, known as `old_key` before the change."""
+        self._generation += 1
+        if self._parallel is not None:
+            self._parallel.changed(entity.key, old_key)
+        if self._tags is not None:
+            self._tags.update(entity, old_key)
+        if self._fuzzy is not None:
+            self._fuzzy.update(entity.key, self._fuzzy_texts(entity), old_key)
+
+    def _unindex(self, key: str) -> None:
+        """Remove the deleted entity from the indexes."""
+        self._generation += 1
+        if self._parallel is not None:
+            self._parallel.changed(key)
+        if self._tags is not None:
+            self._tags.remove(key)
+        if self._fuzzy is not None:
+            self._fuzzy.remove(key)
+
     @abstractmethod
     def _match_entity(self, entity: T, query: str, tag: str = "") -> bool:
         """Check if the entity matches the query. Must be implemented by the child class."""
         pass
+
+    @abstractmethod
+    def add(self, entity: T) -> None:
+        """Add the entity to the collection. Must be implemented by the child class."""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete the entity by its key. Must be implemented by the child class."""
+        pass
+
+    @abstractmethod
+    def find_entity(self, key: str) -> T | None:
+        """Find the entity by its key. Must be implemented by the child class."""
+        pass
+
+    def apply_event(self, event: str, key: str, args: tuple) -> None:
+        """Repeat the change reported to the observers, e.g. when replaying a journal."""
+        if event == "add":
+            self.add(self.entity_class.from_dict(args[0]))
+        elif event == "put":
+            if self.find_entity(key) is not None:
+                self.delete(key)
+            self.add(self.entity_class.from_dict(args[0]))
+        elif event == "delete":
+            if self.find_entity(key) is not None:
+                self.delete(key)
+        elif event == "rename_tag":
+            # the rename is global, the other collections report it too
+            if registry.find(key) is not None:
+                registry.rename(key, args[0])
+        else:
+            entity = self.find_entity(key)
+            if entity is None:
+                raise KeyError(f"The entity '{key}' is not found.")
+            getattr(entity, event)(*args)
+
+    def _init_state(self) -> None:
+        """Set up the runtime state which is not pickled with the collection."""
+        self._observers: list[Observer] = []
+        self._lock = threading.Lock()
+        self._dirty: set[str] = set()
+        self._deleted: set[str] = set()
+        # id of the thread applying the changes saved by another process, see `merging()`
+        self._merging: int | None = None
+        # built on first use, see `_tag_index()` and `_fuzzy_index()`
+        self._tags: TagIndex[T] | None = None
+        self._fuzzy: FuzzyIndex | None = None
+        # bumped by every change, the cached search results of the earlier generations are stale
+        self._generation = 0
+        self._search_cache: SearchCache[T] = SearchCache(self.search_cache_size)
+        # the worker processes searching the shards, see `start_parallel_search()`
+        self._parallel: "ParallelSearch[T] | None" = None
+        registry.subscribe(self._tag_renamed, self._check_tag_rename)
+
+    def add_observer(self, observer: Observer) -> None:
+        """Register a callback invoked after every change of the collection or its entities."""
+        self._observers.append(observer)
+
+    def remove_observer(self, observer: Observer) -> None:
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    @contextmanager
+    def merging(self):
+        """Apply the changes saved by another process in this block.
+
+        The changes made by the current thread are neither marked as unsaved
+        nor reported to the observers, as they are saved already.
+        """
+        self._merging = threading.get_ident()
+        try:
+            yield
+        finally:
+            self._merging = None
+
+    def _emit(self, event: str, key: str, *args: Any) -> None:
+        if self._merging is not None and self._merging == threading.get_ident():
+            return
+        for observer in list(self._observers):
+            observer(self, event, key, args)
+
+    def _attach(self, entity: T) -> None:
+        """Start listening to the changes of the entity stored in the collection."""
+        entity.subscribe(self._entity_changed)
+
+    def _detach(self, entity: T) -> None:
+        entity.unsubscribe(self._entity_changed)
+
+    def _entity_changed(self, entity: T, event: str, args: tuple, key: str) -> None:
+        """Update the indexes, remember the changed entity and forward the change to the observers."""
+        self._index(entity, key)
+        if entity.key != key:
+            self._mark_deleted(key)
+        self._mark_dirty(entity.key)
+        self._emit(event, key, *args)
+
+    def _check_tag_rename(self, old_value: str, new_value: str) -> None:
+        """Reject renaming a tag to one the entities carry, or a tag of a read-only store, which could not persist it."""
+        if self.count_tag(new_value):
+            raise ValueError(f"The tag '{new_value}' already exists.")
+        store = getattr(self, "_store", None)
+        if store is not None and getattr(store, "read_only", False) and self.count_tag(old_value):
+            raise ValueError(f"The tag '{old_value}' cannot be renamed, the entities carrying it are read-only.")
+
+    def _tag_renamed(self, tag_id: int, old_value: str, new_value: str) -> None:
+        """Persist the tag renamed in the registry, the entities already show the new value."""
+        self._generation += 1
+        if self._parallel is not None:
+            self._parallel.tag_renamed(old_value, new_value)
+        if getattr(self, "_store", None) is not None:
+            self._store.rename_tag(old_value, new_value)
+        else:
+            for key in self._tag_index().keys(new_value):
+                self._mark_dirty(key)
+        self._emit("rename_tag", old_value, new_value)
+
+    def _mark_dirty(self, key: str) -> None:
+        if self._merging is not None and self._merging == threading.get_ident():
+            return
+        with self._lock:
+            self._deleted.discard(key)
+            self._dirty.add(key)
+
+    def _mark_deleted(self, key: str) -> None:
+        if self._merging is not None and self._merging == threading.get_ident():
+            return
+        with self._lock:
+            self._dirty.discard(key)
+            self._deleted.add(key)
+
+    @property
+    def has_changes(self) -> bool:
+        """Whether entities were changed or deleted since the last `take_changes()`."""
+        return bool(self._dirty or self._deleted)
+
+    @property
+    def pending_changes(self) -> int:
+        """The number of entities changed or deleted since the last `take_changes()`."""
+        return len(self._dirty) + len(self._deleted)
+
+    def pending_keys(self) -> set[str]:
+        """The keys of the entities changed or deleted since the last `take_changes()`."""
+        with self._lock:
+            return self._dirty | self._deleted
+
+    def take_changes(self) -> tuple[List[T], List[str]]:
+        """Get the entities changed and the keys deleted since the last call, and mark them clean."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            deleted, self._deleted = self._deleted, set()
+
+        changed = []
+        for key in dirty:
+            entity = self.find_entity(key)
+            if entity is not None:
+                entity.mark_clean()
+                changed.append(entity)
+        return changed, list(deleted)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for name in self._runtime_state:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._init_state()
+        for entity in self.get_all():
+            self._attach(entity)
@@ -1,24 +1,105 @@
+from functools import cache
+from typing import Any, Callable, Iterable, KeysView
+
 from fields.tag import Tag
+from fields.tag_registry import registry
+
+# listener(entity, event, args, key) is called after every mutation of the entity
+Listener = Callable[["BaseEntity", str, tuple, str], None]
+
+
+@cache
+def _pickled_slots(cls: type) -> tuple[str, ...]:
+    """Get the names of the slots of the class and its bases, except the runtime ones."""
+    names = (name for klass in reversed(cls.__mro__) for name in klass.__dict__.get("__slots__", ()))
+    return tuple(name for name in names if name not in ("_listeners", "_dirty", "_tag_ids"))
 
 
 class BaseEntity:
+    # subclasses declare their own `__slots__` too, so the entities have no `__dict__`
+    __slots__ = ("_tag_ids", "_listeners", "_dirty")
+
     def __init__(self) -> None:
-        self.tags: list[Tag] = []
+        # ordered set of the ids in the tag registry, None while there are no tags
+        self._tag_ids: dict[int, None] | None = None
+        self._listeners: list[Listener] = []
+        self._dirty = True
+
+    @property
+    def key(self) -> str:
+        """The value the entity is stored under in its collection."""
+        raise NotImplementedError
+
+    def subscribe(self, listener: Listener) -> None:
+        """Register a callback invoked after every mutation of the entity."""
+        if getattr(self, "_listeners", None) is None:
+            self._listeners = []
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        listeners = getattr(self, "_listeners", [])
+        if listener in listeners:
+            listeners.remove(listener)
+
+    @property
+    def tags(self) -> list[Tag]:
+        return [registry.tag(tag_id) for tag_id in self.tag_ids]
+
+    @tags.setter
+    def tags(self, tags: Iterable[Tag | str]) -> None:
+        ids = (registry.intern(tag.value if isinstance(tag, Tag) else tag) for tag in tags)
+        self._tag_ids = dict.fromkeys(ids) or None
+
+    @property
+    def tag_ids(self) -> KeysView[int] | tuple:
+        """The registry ids of the tags in the order they were added."""
+        return getattr(self, "_tag_ids", None) or ()
+
+    @property
+    def is_dirty(self) -> bool:
+        """Whether the entity was changed since it was last persisted."""
+        return getattr(self, "_dirty", False)
+
+    def mark_clean(self) -> None:
+        self._dirty = False
+
+    def _notify(self, event: str, *args: Any, key: str | None = None) -> None:
+        """Mark the entity changed and tell the listeners that the method `event` was called with `args`."""
+        self._dirty = True
+        listeners = getattr(self, "_listeners", None)
+        if not listeners:
+            return
+        key = self.key if key is None else key
+        for listener in list(listeners):
+            listener(self, event, args, key)
+
+    def __getstate__(self) -> dict:
+        state = {name: getattr(self, name) for name in _pickled_slots(type(self)) if hasattr(self, name)}
+        # the ids are only valid in this process
+        state["tags"] = [registry.value(tag_id) for tag_id in self.tag_ids]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        # the entities pickled before the slots were added have the `__dict__` as the state
+        for name, value in state.items():
+            if name not in ("_listeners", "_dirty"):
+                setattr(self, name, value)
 
     def add_tags(self, tags: list[str]) -> None:
-        self_tags = getattr(self, "tags", [])
-        for tag in set(tags):
-            if tag not in [tag.value for tag in self_tags]:
-                self_tags.append(Tag(tag))
-        self.tags = self_tags
+        # all the tags are validated before any is added
+        ids = [registry.intern(tag) for tag in tags]
+        tag_ids = getattr(self, "_tag_ids", None) or {}
+        for tag_id in ids:
+            tag_ids[tag_id] = None
+        self._tag_ids = tag_ids or None
+        self._notify("add_tags", list(tags))
 
     def remove_tags(self, tags: list[str]) -> None:
-        self_tags = getattr(self, "tags", [])
-        filtered = []
-        for tag in self_tags:
-            if tag.value not in tags:
-                filtered.append(tag)
-        self.tags = filtered
-    
+        tag_ids = getattr(self, "_tag_ids", None)
+        for tag in tags if tag_ids else ():
+            tag_ids.pop(registry.find(tag), None)
+        self._tag_ids = tag_ids or None
+        self._notify("remove_tags", list(tags))
+
     def includes_tag(self, tag: str) -> bool:
-        return any(t.value == tag for t in getattr(self, "tags", []))
\ No newline at end of file
+        return registry.find(tag) in self.tag_ids
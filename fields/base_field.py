@@ -1,8 +1,17 @@
 class Field:
     """A base class for a generic field with the value."""
 
+    # subclasses declare their own `__slots__` too, so the fields have no `__dict__`
+    __slots__ = ("value",)
+
     def __init__(self, value: str) -> None:
         self.value = value
 
     def __str__(self) -> str:
         return str(self.value)
+
+    def __getstate__(self) -> dict:
+        return {"value": self.value}
+
+    def __setstate__(self, state: dict) -> None:
+        self.value = state["value"]
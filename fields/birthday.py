@@ -1,13 +1,60 @@
 from .base_field import Field
-from datetime import datetime
+import calendar
+import re
+from datetime import date, datetime
+
+DATE_FORMAT = "%d.%m.%Y"
+DATE_PATTERN = re.compile(r"(\d\d)\.(\d\d)\.(\d{4})", re.ASCII)
+
+
+def format_date(day: date) -> str:
+    """Format the date as DD.MM.YYYY, strftime() does not pad the years before 1000 on every platform."""
+    return f"{day.day:02}.{day.month:02}.{day.year:04}"
 
 
 class Birthday(Field):
-    """A class for a field to store a birthday date."""
+    """A class for a field to store a birthday date.
+
+    The date is kept as its proleptic Gregorian ordinal, `value` and `date`
+    are derived from it.
+    """
+
+    __slots__ = ("ordinal",)
 
     def __init__(self, value):
         try:
-            self.date = datetime.strptime(value, "%d.%m.%Y")
+            if match := DATE_PATTERN.fullmatch(value):
+                # the common case without the slow strptime()
+                day, month, year = match.groups()
+                self.ordinal = date(int(year), int(month), int(day)).toordinal()
+            else:
+                self.ordinal = datetime.strptime(value, DATE_FORMAT).toordinal()
         except ValueError:
             raise ValueError("Invalid date format. Use DD.MM.YYYY")
-        super().__init__(value)
+
+    def next_date(self, today: date) -> date:
+        """Get the date of the nearest birthday on or after today."""
+        birthday = date.fromordinal(self.ordinal)
+        for year in (today.year, today.year + 1):
+            if birthday.month == 2 and birthday.day == 29 and not calendar.isleap(year):
+                # celebrated on the 1st of March in common years
+                next_birthday = date(year, 3, 1)
+            else:
+                next_birthday = birthday.replace(year=year)
+            if next_birthday >= today:
+                return next_birthday
+
+    @property
+    def value(self) -> str:
+        return format_date(date.fromordinal(self.ordinal))
+
+    @property
+    def date(self) -> datetime:
+        return datetime.fromordinal(self.ordinal)
+
+    def __getstate__(self) -> dict:
+        return {"ordinal": self.ordinal}
+
+    def __setstate__(self, state: dict) -> None:
+        # the birthdays pickled before kept the `datetime` and the string
+        self.ordinal = state["ordinal"] if "ordinal" in state else state["date"].toordinal()
@@ -0,0 +1,165 @@
+from datetime import date
+from typing import Iterable
+
+# the proleptic Gregorian ordinal of 1970-01-01, day 0 of numpy.datetime64
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _days(day: date) -> int:
+    """Get the number of the days since 1970-01-01."""
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def _year_starts(years):
+    """Get the ordinals of the 1st of January of the years, any integers or an array of them."""
+    previous = years - 1
+    return previous * 365 + previous // 4 - previous // 100 + previous // 400 + 1
+
+
+def _numpy():
+    """Import NumPy on first use, it is needed by the analytics only."""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The birthday analytics need NumPy, install it with `pip install numpy`.") from None
+    return numpy
+
+
+class BirthdayAnalytics:
+    """Birthdays of the records packed into NumPy arrays for the bulk calendar queries.
+
+    The birthday ordinals are kept by name and updated with the records, the
+    arrays of the `dates`, `years`, `months`, `days` and `days_of_year` are
+    packed from them by `pack()`, which the queries call after a change. The
+    record index of the arrays is the position of the name in `names`. As in
+    `AddressBook.upcoming_birthdays()`, the 29th of February is celebrated on
+    the 1st of March in common years.
+    """
+
+    def __init__(self) -> None:
+        self._np = _numpy()
+        self._ordinals: dict[str, int] = {}
+        self._packed = False
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+    def build(self, birthdays: Iterable[tuple[str, int]]) -> None:
+        """Keep the (name, birthday ordinal) pairs at once."""
+        self._ordinals = dict(birthdays)
+        self._packed = False
+
+    def update(self, name: str, ordinal: int | None, old_name: str | None = None) -> None:
+        """Keep the current birthday of the record, previously kept under `old_name` if it was renamed."""
+        self.remove(name if old_name is None else old_name)
+        if ordinal is not None:
+            self._ordinals[name] = ordinal
+            self._packed = False
+
+    def remove(self, name: str) -> None:
+        if self._ordinals.pop(name, None) is not None:
+            self._packed = False
+
+    def pack(self) -> "BirthdayAnalytics":
+        """Pack the arrays if the birthdays changed since they were packed."""
+        if self._packed:
+            return self
+        np = self._np
+        self.names = list(self._ordinals)
+        days = np.fromiter(self._ordinals.values(), dtype=np.int64, count=len(self._ordinals)) - EPOCH_ORDINAL
+        self.dates = days.astype("datetime64[D]")
+        # the civil date of the days since 1970-01-01 with integer operations, the datetime64
+        # unit conversions are much slower (H. Hinnant's `civil_from_days()`)
+        shifted = days + 719468
+        eras = shifted // 146097
+        day_of_era = shifted - eras * 146097
+        year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+        day_of_march_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+        march_month = (5 * day_of_march_year + 2) // 153
+        self.days = day_of_march_year - (153 * march_month + 2) // 5 + 1
+        self.months = np.where(march_month < 10, march_month + 3, march_month - 9)
+        self.years = year_of_era + eras * 400 + (self.months <= 2)
+        self.days_of_year = days - (_year_starts(self.years) - EPOCH_ORDINAL) + 1
+        self._packed = True
+        return self
+
+    def _celebrated(self, year: int):
+        """Get the days since 1970-01-01 of the birthdays in the year."""
+        np = self._np
+        month_starts = np.array([_days(date(year, month, 1)) for month in range(1, 13)])
+        # the 29th of February of a common year is the day after the 28th, the 1st of March
+        return month_starts[self.months - 1] + (self.days - 1)
+
+    def next_dates(self, today: date):
+        """Get the dates of the nearest birthdays on or after today, by record index."""
+        self.pack()
+        np = self._np
+        days = self._celebrated(today.year)
+        days = np.where(days < _days(today), self._celebrated(today.year + 1), days)
+        return days.astype("datetime64[D]")
+
+    def month_histogram(self) -> list[int]:
+        """Get the number of the birthdays in every month, January first."""
+        self.pack()
+        return self._np.bincount(self.months - 1, minlength=12).tolist()
+
+    def week_histogram(self, year: int) -> list[int]:
+        """Get the number of the birthdays celebrated in every ISO week of the year, the 1st one first.
+
+        The birthdays of the last days of December falling into the 1st week
+        of the next year are counted in the 1st week, the ones of the first
+        days of January falling into the last week of the previous year are
+        not counted.
+        """
+        self.pack()
+        np = self._np
+        days = self._celebrated(year)
+        # 1970-01-01 was a Thursday, the week of a day is the week of its Thursday
+        thursdays = days + (3 - (days + 3) % 7)
+        start, next_start = _days(date(year, 1, 1)), _days(date(year + 1, 1, 1))
+        thursdays = thursdays[thursdays >= start]
+        weeks = np.where(thursdays >= next_start, 1, (thursdays - start) // 7 + 1)
+        # the 28th of December is always in the last week of its year
+        week_count = date(year, 12, 28).isocalendar().week
+        return np.bincount(weeks, minlength=week_count + 1)[1:].tolist()
+
+    def between(self, start: date, end: date) -> list[tuple[date, str]]:
+        """Get the (date, name) pairs of the birthdays from `start` to `end` sorted by date.
+
+        Every record is listed once, with its first birthday in the range.
+        """
+        if end < start:
+            return []
+        np = self._np
+        dates = self.next_dates(start)
+        indices = np.flatnonzero(dates <= np.datetime64(end, "D"))
+        return self._pairs(dates[indices], indices)
+
+    def upcoming(self, today: date, days: int = 7) -> list[tuple[date, str]]:
+        """Get the (date, name) pairs of `AddressBook.upcoming_birthdays()`, moving the weekend ones to Monday."""
+        np = self._np
+        dates = self.next_dates(today)
+        indices = np.flatnonzero(dates <= np.datetime64(today, "D") + days)
+        dates = dates[indices]
+        weekdays = (dates.astype(np.int64) + 3) % 7
+        return self._pairs(dates + np.where(weekdays >= 5, 7 - weekdays, 0), indices)
+
+    def ages(self, today: date):
+        """Get the ages of the contacts on the day, by record index."""
+        self.pack()
+        before_birthday = today.month * 100 + today.day < self.months * 100 + self.days
+        return today.year - self.years - before_birthday
+
+    def age_distribution(self, today: date, bucket: int = 10) -> dict[int, int]:
+        """Get the number of the contacts by the first age of their `bucket` years, ages under 0 are skipped."""
+        np = self._np
+        ages = self.ages(today)
+        counts = np.bincount(ages[ages >= 0] // bucket)
+        return {index * bucket: count for index, count in enumerate(counts.tolist()) if count}
+
+    def _pairs(self, dates, indices) -> list[tuple[date, str]]:
+        """Get the (date, name) pairs of the records at the indices sorted like the upcoming birthdays."""
+        names = self.names
+        pairs = list(zip(dates.tolist(), (names[index] for index in indices.tolist())))
+        pairs.sort()
+        return pairs
@@ -0,0 +1,64 @@
+import calendar
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from typing import Iterable
+
+# birthdays are ordered by month * 100 + day, so that a day-of-year range is a slice
+LAST_DAY = 1231
+
+
+def day_key(day: date) -> int:
+    return day.month * 100 + day.day
+
+
+def day_window(start: date, end: date) -> tuple[int, int]:
+    """Get the keys of the days from `start` to `end`, the first one is greater if the window wraps at year end."""
+    if (end - start).days >= 365:
+        return 0, LAST_DAY
+
+    start_key = day_key(start)
+    if start_key == 301 and not calendar.isleap(start.year):
+        # 29th of February is celebrated on the 1st of March in common years
+        start_key = 229
+    return start_key, day_key(end)
+
+
+class BirthdayIndex:
+    """Names of the records sorted by the day and month of the birthday."""
+
+    def __init__(self) -> None:
+        self._entries: list[tuple[int, str]] = []
+        self._keys: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def build(self, birthdays: Iterable[tuple[str, date]]) -> None:
+        """Index the (name, birthday) pairs at once, sorting them a single time."""
+        self._keys = {name: day_key(birthday) for name, birthday in birthdays}
+        self._entries = sorted((key, name) for name, key in self._keys.items())
+
+    def update(self, name: str, birthday: date | None, old_name: str | None = None) -> None:
+        """Index the current birthday of the record, previously indexed under `old_name` if it was renamed."""
+        self.remove(name if old_name is None else old_name)
+        if birthday is None:
+            return
+        self._keys[name] = day_key(birthday)
+        insort(self._entries, (self._keys[name], name))
+
+    def remove(self, name: str) -> None:
+        key = self._keys.pop(name, None)
+        if key is not None:
+            del self._entries[bisect_left(self._entries, (key, name))]
+
+    def between(self, start: date, end: date) -> list[str]:
+        """Get the names of the records with the birthday from `start` to `end`, wrapping at year end."""
+        start_key, end_key = day_window(start, end)
+        if start_key <= end_key:
+            return self._slice(start_key, end_key)
+        return self._slice(start_key, LAST_DAY) + self._slice(0, end_key)
+
+    def _slice(self, start_key: int, end_key: int) -> list[str]:
+        low = bisect_left(self._entries, start_key, key=lambda entry: entry[0])
+        high = bisect_right(self._entries, end_key, key=lambda entry: entry[0])
+        return [name for _, name in self._entries[low:high]]
@@ -5,6 +5,8 @@ import re
 class Email(Field):
     """A class for a field to store an email address."""
 
+    __slots__ = ()
+
     def __init__(self, value):
         if not self._is_valid_email(value):
             raise ValueError("Invalid email address format.")
@@ -0,0 +1,85 @@
+import re
+from heapq import nlargest
+from operator import itemgetter
+from typing import Callable, Iterable
+
+SCORE_MIN = float("-inf")
+# the matches in the fields after the first one (name or title) score lower by this
+FIELD_PENALTY = 1.0
+
+
+def lowered(text: str) -> str:
+    """Lowercase the text, keeping the same string object if it is lowercase already."""
+    lower = text.lower()
+    return text if lower == text else lower
+
+
+def char_mask(text: str) -> int:
+    """Get the bit mask of the characters in the text, to rule out the texts missing some query character."""
+    mask = 0
+    for char in set(text):
+        mask |= 1 << (ord(char) & 63)
+    return mask
+
+
+class FuzzyIndex:
+    """Lowercased searchable texts of the entities for the fuzzy search.
+
+    The texts are normalized when the entities are indexed, so a query only
+    scores them with the fzy algorithm of `pfzy`. The letters of the query
+    have to appear in the text in the same order, but other letters may be
+    between them, e.g. "jhn smt" matches "John Smith". The texts without
+    such a match are ruled out by the character mask and a regular
+    expression first, and the best `limit` matches are selected with a heap
+    instead of sorting all of them.
+    """
+
+    def __init__(self) -> None:
+        # key -> (character mask, texts joined with newlines)
+        self._entries: dict[str, tuple[int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, key: str, texts: Iterable[str], old_key: str | None = None) -> None:
+        """Index the lowercased texts of the entity, previously indexed under `old_key` if it was renamed."""
+        self.remove(key if old_key is None else old_key)
+        text = "\n".join(text.replace("\n", " ") for text in texts)
+        self._entries[key] = (char_mask(text), text)
+
+    def remove(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def top(self, query: str, limit: int, keys: Iterable[str] | None = None) -> list[str]:
+        """Get the keys of at most `limit` entities matching the lowercased query, the best first."""
+        # pfzy imports asyncio, which the one-shot commands do not need otherwise
+        from pfzy import fzy_scorer
+
+        query_mask = char_mask(query)
+        # the query letters in order, within a single text
+        pattern = re.compile("[^\n]*?".join(map(re.escape, query)))
+        entries = self._entries
+        if keys is None:
+            candidates = entries.items()
+        else:
+            candidates = ((key, entries[key]) for key in keys if key in entries)
+
+        scores = (
+            (score, key)
+            for key, (mask, text) in candidates
+            if mask & query_mask == query_mask and pattern.search(text)
+            and (score := self._score(fzy_scorer, query, pattern, text)) > SCORE_MIN
+        )
+        return [key for _, key in nlargest(limit, scores, key=itemgetter(0))]
+
+    @staticmethod
+    def _score(scorer: Callable, query: str, pattern: re.Pattern, text: str) -> float:
+        best = SCORE_MIN
+        for index, field in enumerate(text.split("\n")):
+            if not pattern.search(field):
+                continue
+            score, _ = scorer(query, field)
+            if index:
+                score -= FIELD_PENALTY
+            best = max(best, score)
+        return best
@@ -3,3 +3,5 @@ from .base_field import Field
 
 class Name(Field):
     """A class for a field to store a name."""
+
+    __slots__ = ()
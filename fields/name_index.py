@@ -0,0 +1,41 @@
+from bisect import bisect_left, insort
+from itertools import takewhile
+from typing import Iterable
+
+
+def _sort_key(name: str) -> tuple[str, str]:
+    return name.casefold(), name
+
+
+class NameIndex:
+    """Names of the records sorted regardless of case, for the completion by prefix.
+
+    The list holds the name strings of the records only, the case-insensitive
+    order is computed for the few names a binary search looks at.
+    """
+
+    def __init__(self) -> None:
+        self._names: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def build(self, names: Iterable[str]) -> None:
+        """Index the names at once, sorting them a single time."""
+        self._names = sorted(names, key=_sort_key)
+
+    def add(self, name: str) -> None:
+        insort(self._names, name, key=_sort_key)
+
+    def remove(self, name: str) -> None:
+        index = bisect_left(self._names, _sort_key(name), key=_sort_key)
+        if index < len(self._names) and self._names[index] == name:
+            del self._names[index]
+
+    def complete(self, prefix: str, limit: int = 50) -> list[str]:
+        """Get at most `limit` names starting with the prefix in any case, in the case-insensitive order."""
+        folded = prefix.casefold()
+        start = bisect_left(self._names, (folded, ""), key=_sort_key)
+        # the names with the prefix are next to each other
+        candidates = self._names[start:start + limit]
+        return list(takewhile(lambda name: name.casefold().startswith(folded), candidates))
@@ -0,0 +1,90 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable
+
+EMPTY = array("I")
+
+
+class NGramIndex:
+    """Inverted index from the n-grams of texts to the keys of the entities containing them.
+
+    Every entity gets a new integer id when it is indexed, so the posting
+    lists stay sorted and can be intersected with a binary search. Removed ids
+    are dropped from the posting lists once they outnumber the live ones.
+    """
+
+    def __init__(self, n: int = 3) -> None:
+        self.n = n
+        self._postings: dict[str, array] = {}
+        self._ids: dict[str, int] = {}
+        self._keys: dict[int, str] = {}
+        self._next_id = 0
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, key: str, texts: Iterable[str]) -> None:
+        """Index the texts of the entity, replacing the texts indexed for the key before."""
+        self.remove(key)
+        entity_id = self._next_id
+        self._next_id += 1
+        self._ids[key] = entity_id
+        self._keys[entity_id] = key
+
+        for gram in self._grams(texts):
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array("I")
+            posting.append(entity_id)
+
+    def remove(self, key: str) -> None:
+        entity_id = self._ids.pop(key, None)
+        if entity_id is None:
+            return
+        del self._keys[entity_id]
+        self._removed += 1
+        if self._removed > max(len(self._ids), 1000):
+            self._drop_removed()
+
+    def candidates(self, query: str, max_postings: int = 3) -> list[str] | None:
+        """Get the keys of the entities which may contain the query.
+
+        Only the `max_postings` shortest posting lists of the query n-grams are
+        intersected, the candidates still have to be checked. Returns None if
+        the query is shorter than n or so common that scanning all entities is
+        cheaper than the lookup.
+        """
+        grams = self._grams([query])
+        if not grams:
+            return None
+
+        postings = sorted((self._postings.get(gram, EMPTY) for gram in grams), key=len)
+        if len(postings[0]) > len(self._ids) // 4 + 1:
+            return None
+
+        ids = postings[0]
+        for posting in postings[1:max_postings]:
+            if not ids:
+                break
+            ids = [entity_id for entity_id in ids if self._contains(posting, entity_id)]
+        return [self._keys[entity_id] for entity_id in ids if entity_id in self._keys]
+
+    def _grams(self, texts: Iterable[str]) -> set[str]:
+        n = self.n
+        return {text[i:i + n] for text in texts for i in range(len(text) - n + 1)}
+
+    @staticmethod
+    def _contains(posting: array, entity_id: int) -> bool:
+        index = bisect_left(posting, entity_id)
+        return index < len(posting) and posting[index] == entity_id
+
+    def _drop_removed(self) -> None:
+        live = self._keys
+        for gram, posting in list(self._postings.items()):
+            kept = array("I", (entity_id for entity_id in posting if entity_id in live))
+            if kept:
+                self._postings[gram] = kept
+            else:
+                del self._postings[gram]
+        self._removed = 0
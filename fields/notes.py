@@ -1,14 +1,17 @@
-from typing import List
-from tabulate import tabulate
+from typing import Iterable, Iterator, List
+from instrumentation import measured_method
 
 from .base_collection import BaseCollection
 from .base_entity import BaseEntity
 from .base_field import Field
+from .fuzzy_index import lowered
 
 
 class Title(Field):
     """A class for a field to store a title of a note."""
 
+    __slots__ = ()
+
     def __init__(self, value: str) -> None:
         if not value:
             raise ValueError("Note title should not be empty.")
@@ -20,6 +23,8 @@ class Title(Field):
 class Content(Field):
     """A class for a field to store a content of a note."""
 
+    __slots__ = ()
+
     def __init__(self, value: str = "") -> None:
         if len(value) > 200:
             raise ValueError("Note title should not be longer than 200 characters.")
@@ -29,11 +34,17 @@ class Content(Field):
 class Note(BaseEntity):
     """A class for a field to store a note as a separate object."""
 
+    __slots__ = ("title", "content")
+
     def __init__(self, title: str, content: str = "", tags: list[str] = []) -> None:
         self.title = Title(title)
         self.content = Content(content)
         super().__init__()
 
+    @property
+    def key(self) -> str:
+        return self.title.value
+
     def __str__(self) -> str:
         title_str = f"Title: {self.title.value}"
         content_str = f"Content: {self.content}" if self.content else "n/a"
@@ -42,35 +53,159 @@ class Note(BaseEntity):
     
     def add_content(self, value: str = ""):
         self.content = Content(value)
+        self._notify("add_content", value)
 
+    def change_title(self, new_title: str) -> None:
+        old_title = self.title.value
+        self.title = Title(new_title)
+        self._notify("change_title", new_title, key=old_title)
 
-class Notes(BaseCollection[Note]):
-    def __init__(self) -> None:
-        self.notes: list = []
+    def to_dict(self) -> dict:
+        """Represent the note with plain values, e.g. for JSON serialization."""
+        return {
+            "title": self.title.value,
+            "content": self.content.value,
+            "tags": [tag.value for tag in getattr(self, "tags", [])],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Note":
+        """Create the note from the result of `to_dict()`."""
+        note = cls(data["title"], data.get("content") or "")
+        data.get("tags") and note.add_tags(data["tags"])
+        return note
 
-    def find_note(self, title: str) -> Note | None:
+
+class Notes(BaseCollection[Note]):
+    entity_class = Note
+    table_headers = ["Title", "Content", "Tags"]
+    _runtime_state = BaseCollection._runtime_state + ("_folded",)
+
+    def __init__(self, store=None) -> None:
+        """Create the notes kept in memory or, if `store` is passed, in the storage engine."""
+        self._init_state()
+        self._store = store
+        # notes by title in the order they were added
+        self.notes: dict[str, Note] = {} if store is None else store.note_mapping(on_load=self._attach)
+
+    def _init_state(self) -> None:
+        super()._init_state()
+        # casefolded titles, built on the first case-insensitive lookup, see `_folded_index()`
+        self._folded: dict[str, dict[str, None]] | None = None
+
+    @measured_method
+    def find_note(self, title: str, ignore_case: bool = False) -> Note | None:
+        """Find the note by title, `ignore_case` matches the first note added with the title in any case."""
         if not title:
             raise ValueError("Title is required")
 
-        for note in self.notes:
-            if note.title.value == title:
-                return note
+        if title in self.notes:
+            return self.notes[title]
+        if ignore_case:
+            for match in self._folded_index().get(title.casefold(), ()):
+                return self.notes[match]
         return None
 
+    def find_entity(self, key: str) -> Note | None:
+        return self.find_note(key)
+
+    def add(self, note: Note) -> None:
+        """Add the note to the collection."""
+        if note.title.value in self.notes:
+            raise KeyError(f"Note with title: '{note.title.value}' already exists.")
+
+        self.notes[note.title.value] = note
+        self._attach(note)
+        self._index(note)
+        self._mark_dirty(note.title.value)
+        self._emit("add", note.title.value, note)
+
+    def delete(self, title: str) -> None:
+        """Delete the note by title."""
+        if title not in self.notes:
+            raise KeyError(f"Note with title: '{title}' is not found.")
+
+        self._detach(self.notes.pop(title))
+        self._unindex(title)
+        self._mark_deleted(title)
+        self._emit("delete", title)
+
     def add_note(self, title: str, text=None) -> str:
         note = Note(title, text)
-        self.notes.append(note)
+        self.add(note)
         return f"Note with title: '{title}' added."
 
     def delete_note(self, title: str) -> str:
-        if not (note := self.find_note(title)):
+        if not self.find_note(title):
             return f"Note with title: '{title}' is not found."
 
-        self.notes.remove(note)
+        self.delete(title)
         return f"Note with title: '{title}' deleted."
 
+    def rename_note(self, title: str, new_title: str) -> str:
+        if not (note := self.find_note(title)):
+            return f"Note with title: '{title}' is not found."
+        if new_title != title and new_title in self.notes:
+            return f"Note with title: '{new_title}' already exists."
+
+        note.change_title(new_title)
+        return f"Note '{title}' renamed to '{new_title}'."
+
     def get_all(self) -> List[Note]:
-        return self.notes
+        return list(self.notes.values())
+
+    def _entity_changed(self, note: Note, event: str, args: tuple, key: str) -> None:
+        if event == "change_title" and note.title.value != key:
+            if note.title.value in self.notes:
+                note.title = Title(key)
+                raise KeyError(f"Note with title: '{args[0]}' already exists.")
+            self.notes[note.title.value] = self.notes.pop(key)
+        if getattr(self, "_store", None) is not None:
+            self._store.save_note(note)
+        super()._entity_changed(note, event, args, key)
+
+    def _index(self, note: Note, old_key: str | None = None) -> None:
+        super()._index(note, old_key)
+        if self._folded is None:
+            return
+        if old_key is not None and old_key != note.key:
+            self._unfold(old_key)
+        self._folded.setdefault(note.key.casefold(), {})[note.key] = None
+
+    def _unindex(self, title: str) -> None:
+        super()._unindex(title)
+        if self._folded is not None:
+            self._unfold(title)
+
+    def _unfold(self, title: str) -> None:
+        titles = self._folded.get(title.casefold(), {})
+        titles.pop(title, None)
+        if not titles:
+            self._folded.pop(title.casefold(), None)
+
+    def _folded_index(self) -> dict[str, dict[str, None]]:
+        """Get the titles by their casefolded value, building the index on first use."""
+        if self._folded is None:
+            self._folded = {}
+            for title in self.notes:
+                self._folded.setdefault(title.casefold(), {})[title] = None
+        return self._folded
+
+    def _candidates(self, query: str, tag: str = "") -> List[Note]:
+        if getattr(self, "_store", None) is None:
+            return super()._candidates(query, tag)
+        return [self.notes[title] for title in self._store.search_notes(query, tag)]
+
+    def _fuzzy_texts(self, note: Note) -> list[str]:
+        texts = [lowered(note.title.value)]
+        if note.content.value:
+            texts.append(lowered(note.content.value))
+        return texts
+
+    def count_tag(self, tag: str) -> int:
+        if getattr(self, "_store", None) is not None:
+            return len(self._store.search_notes("", tag))
+        return super().count_tag(tag)
     
     def _match_entity(self, record: Note, query: str, tag: str = "") -> Note | None:
         """Check if the record matches the query."""
@@ -84,12 +219,23 @@ class Notes(BaseCollection[Note]):
             return None
         return record
     
+    def __setstate__(self, state: dict) -> None:
+        # the notes were kept in a list before
+        if isinstance(state.get("notes"), list):
+            state["notes"] = {note.title.value: note for note in state["notes"]}
+        super().__setstate__(state)
+
+    @measured_method
     def render_table(self, notes: list[Note], no_data_str: str) -> str:
+        from tabulate import tabulate
+
         if not notes:
             return tabulate([[no_data_str]], tablefmt="grid")
-        table = []
+        return tabulate(list(self.table_rows(notes)), headers=self.table_headers, tablefmt="grid")
+
+    def table_rows(self, notes: Iterable[Note]) -> Iterator[list[str]]:
+        """Get the table row of each note, one by one."""
         for note in notes:
             tags = getattr(note, "tags", [])
             tags_str = "; ".join(tag.value for tag in tags) if tags else "N/A"
-            table.append([note.title.value, note.content.value, tags_str])
-        return tabulate(table, headers=["Title", "Content", "Tags"], tablefmt="grid")
+            yield [note.title.value, note.content.value, tags_str]
@@ -0,0 +1,165 @@
+import multiprocessing
+import threading
+import zlib
+from itertools import chain
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+from .base_entity import BaseEntity
+from .search_cache import SearchCache
+
+if TYPE_CHECKING:
+    from .base_collection import BaseCollection
+
+T = TypeVar('T', bound=BaseEntity)
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Get the shard of the entity key, the same in every process and run."""
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+def _serve_shard(connection, collection_class: type, entities: list[dict]) -> None:
+    """Keep one shard of the collection in the worker process and search it on request."""
+    collection = collection_class()
+    # the results are cached by the collection searched in parallel
+    collection._search_cache = SearchCache(0)
+    for data in entities:
+        collection.add(collection_class.entity_class.from_dict(data))
+    collection.take_changes()
+    del entities
+
+    while True:
+        try:
+            op, args = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if op == "update":
+            for event, key, event_args in args:
+                collection.apply_event(event, key, event_args)
+            # nothing is saved in the worker
+            collection.take_changes()
+        elif op == "search":
+            query, tag, sort, order = args
+            try:
+                found = collection.search(query, tag, sort, order)
+                keys = [entity.key for entity in found]
+                values = [getattr(entity, sort).value for entity in found]
+                # sorted by the keys themselves, e.g. by the name, the values are not sent
+                connection.send((True, (keys, None if values == keys else values)))
+            except Exception as e:
+                connection.send((False, e))
+        elif op == "stop":
+            break
+    connection.close()
+
+
+class ParallelSearch(Generic[T]):
+    """Shards of a collection kept by worker processes, which search them at once.
+
+    The entities are split by the hash of their keys and every worker gets
+    its shard once, when it starts. The changes of the collection are
+    recorded by key, see `changed()`, and sent to the workers before the
+    next search. A search is sent to all workers, each one runs the search
+    of the collection on its shard and returns the keys of the matches in
+    order, with their sort values unless they are the keys, and the sorted
+    lists are merged. The entities returned are the ones of the collection,
+    in the order of the serial search: the searches sort by the name or the
+    title, which are unique.
+    """
+
+    def __init__(self, collection: "BaseCollection[T]", workers: int) -> None:
+        if workers < 1:
+            raise ValueError("The parallel search needs at least one worker.")
+        self._collection = collection
+        self._lock = threading.Lock()
+        # the keys of the changed, added and deleted entities in the order of the changes
+        self._changed: dict[str, None] = {}
+        self._renamed_tags: list[tuple[str, str]] = []
+
+        shards: list[list[dict]] = [[] for _ in range(workers)]
+        for entity in collection.get_all():
+            shards[shard_of(entity.key, workers)].append(entity.to_dict())
+        # spawned, as forking a process running other threads (the autosave) may deadlock
+        context = multiprocessing.get_context("spawn")
+        self._connections = []
+        self._processes = []
+        for entities in shards:
+            connection, child_connection = context.Pipe()
+            process = context.Process(
+                target=_serve_shard, args=(child_connection, type(collection), entities), daemon=True,
+            )
+            process.start()
+            child_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    @property
+    def workers(self) -> int:
+        return len(self._processes)
+
+    def changed(self, key: str, old_key: str | None = None) -> None:
+        """Send the entity to its worker before the next search, or delete it if it is gone."""
+        with self._lock:
+            self._changed[key] = None
+            if old_key is not None and old_key != key:
+                self._changed[old_key] = None
+
+    def tag_renamed(self, old_value: str, new_value: str) -> None:
+        with self._lock:
+            self._renamed_tags.append((old_value, new_value))
+
+    def search(self, query: str, tag: str = "", sort: str = "name", order: str = "asc") -> tuple[T, ...]:
+        """Search all shards at once and merge the results like `BaseCollection.search()` sorts them."""
+        with self._lock:
+            self._send_changes()
+            for connection in self._connections:
+                connection.send(("search", (query, tag, sort, order)))
+            parts, error = [], None
+            # every worker is answered, even if another one failed
+            for connection in self._connections:
+                ok, result = connection.recv()
+                if ok:
+                    parts.append(result)
+                else:
+                    error = result
+        if error is not None:
+            raise error
+
+        if len(parts) == 1:
+            keys = parts[0][0]
+        else:
+            keys = list(chain.from_iterable(part_keys for part_keys, _ in parts))
+            values = list(chain.from_iterable(keys if values is None else values for keys, values in parts))
+            # sorting the concatenated sorted lists merges them, faster than heapq.merge()
+            positions = sorted(range(len(keys)), key=values.__getitem__, reverse=(order != "asc"))
+            keys = [keys[position] for position in positions]
+        return tuple(map(self._collection.find_entity, keys))
+
+    def close(self) -> None:
+        """Stop the workers."""
+        for connection in self._connections:
+            try:
+                connection.send(("stop", None))
+            except OSError:
+                pass
+        for process, connection in zip(self._processes, self._connections):
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            connection.close()
+        self._connections, self._processes = [], []
+
+    def _send_changes(self) -> None:
+        if not self._changed and not self._renamed_tags:
+            return
+        # the tags first: the entities sent next carry the new names already
+        updates = [[("rename_tag", old, (new,)) for old, new in self._renamed_tags] for _ in self._connections]
+        for key in self._changed:
+            entity = self._collection.find_entity(key)
+            event = ("delete", key, ()) if entity is None else ("put", key, (entity.to_dict(),))
+            updates[shard_of(key, self.workers)].append(event)
+        for connection, events in zip(self._connections, updates):
+            if events:
+                connection.send(("update", events))
+        self._changed = {}
+        self._renamed_tags = []
@@ -4,6 +4,8 @@ from .base_field import Field
 class Phone(Field):
     """A class for a field to store a phone number."""
 
+    __slots__ = ()
+
     def __init__(self, number: str) -> None:
         self.value = self.validate_number(number)
 
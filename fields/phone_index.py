@@ -0,0 +1,65 @@
+from bisect import bisect_left, insort
+from typing import Iterable
+
+
+class PhoneIndex:
+    """Reverse index from the phone numbers to the names of the records having them.
+
+    A hash gives the owners of an exact number, a sorted list of the distinct
+    numbers answers prefix queries with a binary search.
+    """
+
+    def __init__(self) -> None:
+        self._owners: dict[str, set[str]] = {}
+        self._numbers: dict[str, list[str]] = {}
+        self._sorted: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def build(self, phones: Iterable[tuple[str, list[str]]]) -> None:
+        """Index the (name, numbers) pairs at once, sorting the numbers a single time."""
+        for name, numbers in phones:
+            self._numbers[name] = numbers
+            for number in numbers:
+                self._owners.setdefault(number, set()).add(name)
+        self._sorted = sorted(self._owners)
+
+    def update(self, name: str, numbers: list[str], old_name: str | None = None) -> None:
+        """Index the current numbers of the record, previously indexed under `old_name` if it was renamed."""
+        self.remove(name if old_name is None else old_name)
+        if not numbers:
+            return
+        self._numbers[name] = numbers
+        for number in numbers:
+            owners = self._owners.get(number)
+            if owners is None:
+                owners = self._owners[number] = set()
+                insort(self._sorted, number)
+            owners.add(name)
+
+    def remove(self, name: str) -> None:
+        for number in self._numbers.pop(name, ()):
+            owners = self._owners.get(number)
+            if owners is None:
+                continue
+            owners.discard(name)
+            if not owners:
+                del self._owners[number]
+                del self._sorted[bisect_left(self._sorted, number)]
+
+    def find(self, number: str) -> list[str]:
+        """Get the names of the records with the number."""
+        return sorted(self._owners.get(number, ()))
+
+    def find_prefix(self, prefix: str, limit: int | None = None) -> list[str]:
+        """Get the names of the records with a number starting with the prefix, e.g. an area code."""
+        names: dict[str, None] = {}
+        index = bisect_left(self._sorted, prefix)
+        while index < len(self._sorted) and self._sorted[index].startswith(prefix):
+            for name in sorted(self._owners[self._sorted[index]]):
+                names[name] = None
+            if limit is not None and len(names) >= limit:
+                break
+            index += 1
+        return list(names)[:limit]
@@ -4,7 +4,6 @@ from .base_entity import BaseEntity
 from .phone import Phone
 from .name import Name
 from .birthday import Birthday
-from .tag import Tag
 from .email import Email
 from .address import Address
 
@@ -12,15 +11,19 @@ from .address import Address
 class Record(BaseEntity):
     """A class for a contact record that contains a name and a list of phone numbers."""
 
+    __slots__ = ("name", "phones", "address", "email", "birthday")
+
     def __init__(self, name: str) -> None:
         self.name = Name(name)
         self.phones: list[Phone] = []
         self.address: Address | None = None
         self.email: Email | None = None
-        self.tags: list[Tag] = []
         self.birthday: Birthday | None = None
         super().__init__()
 
+    @property
+    def key(self) -> str:
+        return self.name.value
 
     def __str__(self) -> str:
         phones_str = "; ".join(phone.value for phone in self.phones)
@@ -30,14 +33,17 @@ class Record(BaseEntity):
     def add_birthday(self, birthday):
         """Add a birthday to the record."""
         self.birthday = Birthday(birthday)
+        self._notify("add_birthday", birthday)
 
     def add_phone(self, number: str) -> None:
         """Add a phone number to the record."""
         self.phones.append(Phone(number))
+        self._notify("add_phone", number)
 
     def remove_phone(self, number: str) -> None:
         """Remove a phone number from the record."""
         self.phones = [phone for phone in self.phones if phone.value != number]
+        self._notify("remove_phone", number)
 
     def edit_phone(self, old_number: str, new_number: str) -> None:
         """Edit a phone number in the record."""
@@ -52,6 +58,8 @@ class Record(BaseEntity):
         if not found:
             raise ValueError("The specified number does not exist or there are no phone numbers for the contact.")
 
+        self._notify("edit_phone", old_number, new_number)
+
     def find_phone(self, number: str) -> Phone | None:
         """Find a phone number in the record."""
         for phone in self.phones:
@@ -60,24 +68,53 @@ class Record(BaseEntity):
         return None
 
     def change_name(self, new_name: str) -> None:
+        old_name = self.name.value
         self.name = Name(new_name)
+        self._notify("change_name", new_name, key=old_name)
 
     def add_email(self, email: str) -> None:
         """Add an email address to the record."""
         self.email = Email(email)
+        self._notify("add_email", email)
 
     def edit_email(self, new_email: str) -> None:
         """Edit the email address in the record."""
         self.email = Email(new_email)
+        self._notify("edit_email", new_email)
 
     def add_address(self, address: str) -> None:
         """Add a physical address to the record."""
         self.address = Address(address)
+        self._notify("add_address", address)
 
     def edit_address(self, new_address: str) -> None:
         """Edit the physical address in the record."""
         self.address = Address(new_address)
+        self._notify("edit_address", new_address)
 
     def get_info_with_title(self, title: str) -> str:
         """Make readable info with current record state and title."""
         return title + "\n" + str(self)
+
+    def to_dict(self) -> dict:
+        """Represent the record with plain values, e.g. for JSON serialization."""
+        return {
+            "name": self.name.value,
+            "phones": [phone.value for phone in self.phones],
+            "email": self.email.value if self.email else None,
+            "address": self.address.value if self.address else None,
+            "birthday": self.birthday.value if self.birthday else None,
+            "tags": [tag.value for tag in getattr(self, "tags", [])],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Record":
+        """Create the record from the result of `to_dict()`."""
+        record = cls(data["name"])
+        for number in data.get("phones", []):
+            record.add_phone(number)
+        data.get("email") and record.add_email(data["email"])
+        data.get("address") and record.add_address(data["address"])
+        data.get("birthday") and record.add_birthday(data["birthday"])
+        data.get("tags") and record.add_tags(data["tags"])
+        return record
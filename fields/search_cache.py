@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class SearchCache(Generic[T]):
+    """Bounded LRU cache of the search results of a collection.
+
+    The results are stamped with the generation of the collection, which
+    every change bumps, so the change itself costs an increment only: the
+    stale results are dropped on the next lookup. The results are tuples, so
+    the callers cannot change the cached ones.
+    """
+
+    def __init__(self, max_size: int = 64) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._results: OrderedDict[Hashable, tuple[T, ...]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, key: Hashable, generation: int) -> tuple[T, ...] | None:
+        """Get the results cached for the key in this generation, or None."""
+        with self._lock:
+            if generation > self._generation:
+                self._results.clear()
+                self._generation = generation
+            results = self._results.get(key) if generation == self._generation else None
+            if results is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._results.move_to_end(key)
+            return results
+
+    def put(self, key: Hashable, generation: int, results: tuple[T, ...]) -> None:
+        """Cache the results found in the generation, dropping the least recently used ones over `max_size`."""
+        with self._lock:
+            if generation != self._generation or self.max_size <= 0:
+                # the collection changed while searching
+                return
+            self._results[key] = results
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "size": len(self._results),
+            "max_size": self.max_size,
+        }
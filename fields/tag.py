@@ -1,10 +1,18 @@
+import sys
+
 from .base_field import Field
 
 
 class Tag(Field):
+    __slots__ = ()
+
     def __init__(self, value: str):
         self.__validate(value)
-        super().__init__(value)
+        # the same few tags are repeated on many entities, keep a single copy of each value
+        super().__init__(sys.intern(value))
+
+    def __setstate__(self, state: dict) -> None:
+        self.value = sys.intern(state["value"])
 
     def __validate(self, value: str) -> None:
         length = len(value)
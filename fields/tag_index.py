@@ -0,0 +1,54 @@
+from typing import Generic, KeysView, TypeVar
+
+from .base_entity import BaseEntity
+from .tag_registry import registry
+
+T = TypeVar('T', bound=BaseEntity)
+
+
+class TagIndex(Generic[T]):
+    """Posting lists from the tag ids to the entities carrying them.
+
+    The lists are keyed by the registry ids, so they stay valid when a tag is
+    renamed.
+    """
+
+    def __init__(self) -> None:
+        self._entities: dict[int, dict[str, T]] = {}
+        self._tags: dict[str, set[int]] = {}
+
+    def update(self, entity: T, old_key: str | None = None) -> None:
+        """Index the current tags of the entity, previously indexed under `old_key` if it was renamed."""
+        self.remove(entity.key if old_key is None else old_key)
+        tags = set(entity.tag_ids)
+        if not tags:
+            return
+        self._tags[entity.key] = tags
+        for tag in tags:
+            self._entities.setdefault(tag, {})[entity.key] = entity
+
+    def remove(self, key: str) -> None:
+        for tag in self._tags.pop(key, ()):
+            entities = self._entities[tag]
+            del entities[key]
+            if not entities:
+                del self._entities[tag]
+
+    def _posting(self, tag: str) -> dict[str, T]:
+        return self._entities.get(registry.find(tag), {})
+
+    def entities(self, tag: str) -> list[T]:
+        """Get the entities with the tag."""
+        return list(self._posting(tag).values())
+
+    def keys(self, tag: str) -> KeysView[str]:
+        """Get the keys of the entities with the tag."""
+        return self._posting(tag).keys()
+
+    def count(self, tag: str) -> int:
+        """Get the number of entities with the tag."""
+        return len(self._posting(tag))
+
+    def counts(self) -> dict[str, int]:
+        """Get the number of entities with each tag."""
+        return {registry.value(tag): len(entities) for tag, entities in self._entities.items()}
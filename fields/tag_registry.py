@@ -0,0 +1,101 @@
+import threading
+from typing import Callable
+from weakref import WeakMethod
+
+from .tag import Tag
+
+# listener(tag_id, old_value, new_value) is called after a tag is renamed
+RenameListener = Callable[[int, str, str], None]
+# check(old_value, new_value) is called before a tag is renamed and raises to reject it
+RenameCheck = Callable[[str, str], None]
+
+
+class TagRegistry:
+    """Tags interned by value, shared by all contacts and notes.
+
+    Every value is validated once and gets an integer id, the entities keep
+    the ids only. Renaming a tag changes its single `Tag` object, so every
+    entity carrying it sees the new value at once.
+
+    The values are never dropped, a tag can be renamed to the value of one no
+    entity carries any more: the collections reject the values they still
+    carry, see `subscribe()`.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._tags: list[Tag] = []
+        self._lock = threading.Lock()
+        # weak, so that the registry does not keep the collections alive
+        self._listeners: list[WeakMethod] = []
+        self._checks: list[WeakMethod] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def intern(self, value: str) -> int:
+        """Get the id of the tag value, validating and registering it the first time."""
+        tag_id = self._ids.get(value)
+        if tag_id is not None:
+            return tag_id
+
+        tag = Tag(value)
+        with self._lock:
+            tag_id = self._ids.get(value)
+            if tag_id is None:
+                tag_id = self._ids[value] = len(self._tags)
+                self._tags.append(tag)
+        return tag_id
+
+    def find(self, value: str) -> int | None:
+        """Get the id of the tag value or None if no entity was ever tagged with it."""
+        return self._ids.get(value)
+
+    def tag(self, tag_id: int) -> Tag:
+        return self._tags[tag_id]
+
+    def value(self, tag_id: int) -> str:
+        return self._tags[tag_id].value
+
+    def rename(self, old_value: str, new_value: str) -> None:
+        """Rename the tag on all contacts and notes."""
+        if old_value == new_value:
+            return
+        Tag(new_value)
+        for check in self._alive(self._checks):
+            check(old_value, new_value)
+        with self._lock:
+            tag_id = self._ids.get(old_value)
+            if tag_id is None:
+                raise KeyError(f"The tag '{old_value}' is not found.")
+            # the id of an unused value is left to the entities outside the collections, if any
+            self._ids[new_value] = self._ids.pop(old_value)
+            self._tags[tag_id].value = new_value
+
+        for listener in self._alive(self._listeners):
+            listener(tag_id, old_value, new_value)
+
+    def subscribe(self, listener: RenameListener, check: RenameCheck | None = None) -> None:
+        """Register a bound method invoked after every rename, it is dropped once its object is gone.
+
+        The bound method `check` is invoked before every rename, before any
+        entity shows the new value, and raises to reject it.
+        """
+        self._listeners.append(WeakMethod(listener))
+        if check is not None:
+            self._checks.append(WeakMethod(check))
+
+    @staticmethod
+    def _alive(references: list[WeakMethod]) -> list[Callable]:
+        """Get the methods whose objects are alive, dropping the others."""
+        methods = []
+        for reference in list(references):
+            method = reference()
+            if method is None:
+                references.remove(reference)
+            else:
+                methods.append(method)
+        return methods
+
+
+registry = TagRegistry()
@@ -1,10 +1,7 @@
 import re
 from email.utils import parseaddr
-from colorama import init, Fore
 from datetime import datetime
 
-init(autoreset=True)
-
 
 def validate_name(name: str) -> bool:
     """Validate the name. It should contain only letters."""
@@ -46,4 +43,6 @@ def validate_tags(tags: list[str]) -> bool:
 # add a red star to indicate that the field is required
 def required_field(value: str) -> str:
     """Check if the value is not empty."""
+    from colorama import Fore
+
     return Fore.LIGHTYELLOW_EX + value + Fore.LIGHTRED_EX + "*" + Fore.LIGHTYELLOW_EX + ": " + Fore.RESET
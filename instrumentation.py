@@ -0,0 +1,231 @@
+"""Latency, call count, result size and memory statistics of the commands.
+
+The handlers decorated with `input_error` and the collection methods
+decorated with `measured_method` are recorded while `instruments.enabled`
+is set, e.g. with the `TRIATEAMO_STATS=1` environment variable. When it is
+not, the handlers only check the flag and the collection methods are not
+wrapped at all, as they are called much more often. With `trace_memory`
+(`TRIATEAMO_STATS_MEMORY=1`) the peak memory allocated by every call is
+traced too, which slows the calls down a lot.
+"""
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from typing import Callable
+
+# the upper bounds of the latency histogram buckets grow by sqrt(2) from 10 us
+BUCKET_BOUNDS_MS = [0.01 * 2 ** (index / 2) for index in range(48)]
+
+
+class OperationStats:
+    """Latency histogram and totals of one operation."""
+
+    __slots__ = ("calls", "errors", "total_ms", "max_ms", "buckets", "sized_calls", "size_total", "size_max", "peak_bytes")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        # the last bucket counts the calls longer than all bounds
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.sized_calls = 0
+        self.size_total = 0
+        self.size_max = 0
+        self.peak_bytes = 0
+
+    def add(self, elapsed_ms: float, size: int | None, peak_bytes: int | None, error: bool) -> None:
+        self.calls += 1
+        self.errors += error
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        index = math.ceil(2 * math.log2(elapsed_ms / BUCKET_BOUNDS_MS[0])) if elapsed_ms > BUCKET_BOUNDS_MS[0] else 0
+        self.buckets[min(index, len(BUCKET_BOUNDS_MS))] += 1
+        if size is not None:
+            self.sized_calls += 1
+            self.size_total += size
+            self.size_max = max(self.size_max, size)
+        if peak_bytes is not None:
+            self.peak_bytes = max(self.peak_bytes, peak_bytes)
+
+    def percentile(self, fraction: float) -> float:
+        """Get the upper bound of the bucket holding the percentile, or the maximum if it is lower."""
+        rank = fraction * self.calls
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "avg_result_size": round(self.size_total / self.sized_calls, 1) if self.sized_calls else None,
+            "max_result_size": self.size_max if self.sized_calls else None,
+            "peak_kb": round(self.peak_bytes / 1024, 1) if self.peak_bytes else None,
+            "histogram": {
+                "bounds_ms": [round(bound, 4) for bound in BUCKET_BOUNDS_MS],
+                "counts": self.buckets,
+            },
+        }
+
+
+class Instrumentation:
+    """Statistics of the operations by their names."""
+
+    def __init__(self, enabled: bool = False, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.operations: dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+        # the absolute traced memory peaks of the calls in progress, see `call()`
+        self._frames = threading.local()
+        # (class, attribute, function) of the methods wrapped while enabled
+        self._methods: list[tuple[type, str, Callable]] = []
+        self._enabled = False
+        self.enabled = enabled
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, enabled: bool) -> None:
+        self._enabled = enabled
+        for owner, name, func in self._methods:
+            setattr(owner, name, self._wrap_method(func) if enabled else func)
+
+    def register_method(self, owner: type, name: str, func: Callable) -> None:
+        """Record the calls of the method of the class while enabled."""
+        self._methods.append((owner, name, func))
+        setattr(owner, name, self._wrap_method(func) if self._enabled else func)
+
+    def _wrap_method(self, func: Callable) -> Callable:
+        @wraps(func)
+        def inner(obj, *args, **kwargs):
+            return self.call(f"{type(obj).__name__}.{func.__name__}", func, (obj, *args), kwargs)
+
+        return inner
+
+    def reset(self) -> None:
+        with self._lock:
+            self.operations = {}
+
+    def call(self, name: str, func, args: tuple, kwargs: dict):
+        """Call the function and record its latency, result size and memory peak."""
+        tracing = self.trace_memory
+        if tracing:
+            frames = self._enter_frame()
+        error = True
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            peak_bytes = self._exit_frame(frames) if tracing else None
+            size = len(result) if not error and isinstance(result, (list, tuple, dict, set)) else None
+            with self._lock:
+                stats = self.operations.get(name)
+                if stats is None:
+                    stats = self.operations[name] = OperationStats()
+                stats.add(elapsed_ms, size, peak_bytes, error)
+
+    def _enter_frame(self) -> list:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        frames = getattr(self._frames, "stack", None)
+        if frames is None:
+            frames = self._frames.stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if frames:
+            # the peak is reset for this call, keep the peak of the outer call so far
+            frames[-1][1] = max(frames[-1][1], peak)
+        tracemalloc.reset_peak()
+        frames.append([current, current])
+        return frames
+
+    @staticmethod
+    def _exit_frame(frames: list) -> int:
+        start, peak = frames.pop()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if frames:
+            frames[-1][1] = max(frames[-1][1], peak)
+        return peak - start
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            operations = dict(self.operations)
+        return {name: stats.to_dict() for name, stats in sorted(operations.items())}
+
+    def report(self) -> str:
+        """Render the table of the operations, the latencies are in ms."""
+        from tabulate import tabulate
+
+        rows = []
+        for name, stats in self.to_dict().items():
+            rows.append([
+                name, stats["calls"], stats["errors"], stats["avg_ms"], stats["p50_ms"], stats["p95_ms"],
+                stats["p99_ms"], stats["max_ms"], stats["avg_result_size"], stats["peak_kb"],
+            ])
+        if not rows:
+            return "No operations recorded yet."
+        headers = ["Operation", "Calls", "Errors", "Avg", "p50", "p95", "p99", "Max", "Avg size", "Peak KB"]
+        return tabulate(rows, headers=headers, tablefmt="grid", missingval="N/A")
+
+    def dump(self, filename: str, extra: dict | None = None) -> None:
+        """Write the statistics, and the `extra` ones, to the JSON file."""
+        data = {"trace_memory": self.trace_memory, "operations": self.to_dict(), **(extra or {})}
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+
+
+instruments = Instrumentation(
+    enabled=os.environ.get("TRIATEAMO_STATS") == "1",
+    trace_memory=os.environ.get("TRIATEAMO_STATS_MEMORY") == "1",
+)
+
+
+def measured(func=None, *, name: str | None = None):
+    """Record the calls of the function under `name`, by default its name."""
+    if func is None:
+        return lambda func: measured(func, name=name)
+    name = name or func.__name__
+
+    @wraps(func)
+    def inner(*args, **kwargs):
+        if not instruments.enabled:
+            return func(*args, **kwargs)
+        return instruments.call(name, func, args, kwargs)
+
+    return inner
+
+
+class _MeasuredMethod:
+    """Registers the method once the class is created and puts the plain function in its place."""
+
+    def __init__(self, func: Callable) -> None:
+        self.func = func
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        instruments.register_method(owner, name, self.func)
+
+
+def measured_method(func: Callable):
+    """Record the calls of the method under the class and method name, e.g. "Notes.search"."""
+    return _MeasuredMethod(func)
@@ -1,15 +1,32 @@
-import pickle
+import argparse
+import os
+import sys
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Sequence
+
+import batch
 from fields.address_book import AddressBook
 from fields.base_entity import BaseEntity
 from fields.record import Record
-from InquirerPy import inquirer
 from colorama import init, Fore
 from fields.validators import validate_name, validate_phone, validate_email, validate_address, validate_birthday, validate_tags
 from fields.notes import Note, Notes
+from fields.tag_registry import registry as tag_registry
 from decorators import input_error
-from utils import suggest_name_input, color_input
+from instrumentation import instruments, measured
+from storage import AutoSaver, Journal
+from utils import color_input, PagedTable, show_pages
+
+if TYPE_CHECKING:
+    from storage.sharded import ShardedStore
+    from storage.sqlite_store import SQLiteStore
 
-init(autoreset=True)
+# the number of the best matches shown by the fuzzy search
+FUZZY_LIMIT = int(os.environ.get("TRIATEAMO_FUZZY_LIMIT", 20))
+# the number of processes searching the collections in parallel, 0 to search them in this one
+SEARCH_WORKERS = int(os.environ.get("TRIATEAMO_SEARCH_WORKERS", 0))
+# the file the command stats are written to on exit, if set
+STATS_FILE = os.environ.get("TRIATEAMO_STATS_FILE")
 
 @input_error
 def show_phone(args: list, book: AddressBook) -> str:
@@ -36,9 +53,30 @@ def delete_contact(args, book: AddressBook):
     return Fore.YELLOW + f"No contact with the name '{name}' exists"
 
 
+@measured
 def show_all_contacts(book: AddressBook) -> str:
-    """Show all contacts in a formatted table."""
-    return book.render_table(list(book.data.values()), no_data_str="Contacts are empty.")
+    """Show all contacts in a formatted table, page by page."""
+    table = PagedTable(book.table_headers, book.table_rows(book.data.values()), no_data_str="Contacts are empty.")
+    show_pages(table)
+    return f"Contacts shown: {table.cursor} of {len(book)}."
+
+
+@input_error
+def lookup_phone(book: AddressBook) -> str:
+    """Show the contacts having the phone number, or a number starting with the entered digits if none has it."""
+    number = color_input("Enter phone number or its beginning: ").strip()
+    if not number.isdigit():
+        raise ValueError("The phone number should have only numbers.")
+
+    records = book.find_by_phone(number)
+    if records:
+        found = f"Contacts with the number {number}: {len(records)}."
+    else:
+        records = book.find_by_phone(number, prefix=True)
+        found = f"No contacts with the number {number}, contacts with a number starting with it: {len(records)}."
+    table = PagedTable(book.table_headers, book.table_rows(records), no_data_str="No contacts with this phone number.")
+    show_pages(table)
+    return found
 
 
 @input_error
@@ -57,10 +95,15 @@ def show_birthday(args, book: AddressBook):
 
 @input_error
 def birthdays(args, book: AddressBook):
-    return book.get_upcoming_birthdays()
+    if args and not args[0].isdigit():
+        raise ValueError("The number of days should be a positive number.")
+    days = int(args[0]) if args else 7
+    return book.get_upcoming_birthdays(days) or f"No birthdays in the next {days} days."
 
 @input_error
 def add_tags(book: AddressBook):
+    from utils import suggest_name_input
+
     name, *_ = suggest_name_input("Enter contact name: ", book).split()
     record = book.find(name)
     if record is None:
@@ -72,16 +115,30 @@ def add_tags(book: AddressBook):
 
 @input_error
 def remove_tags(book: AddressBook):
+    from utils import suggest_name_input
+
     name, *_ = suggest_name_input("Enter contact name: ", book).split()
     record = book.find(name)
     if record is None:
         return f"The record with name '{name}' is not found."
     tags = color_input("Enter tags: ").split()
-    record.add_tags(tags)
     record.remove_tags(tags)
     return "Tags removed."
 
 
+@input_error
+def rename_tag(book: AddressBook, notes: Notes) -> str:
+    """Rename the tag on all contacts and notes at once."""
+    old_tag = color_input("Enter the tag to rename: ")
+    if not book.count_tag(old_tag) and not notes.count_tag(old_tag):
+        return f"The tag '{old_tag}' is not found."
+    new_tag = color_input("Enter the new name: ")
+    # the tags of the contacts and notes kept in the store are not registered until they are loaded
+    tag_registry.intern(old_tag)
+    tag_registry.rename(old_tag, new_tag)
+    return f"Tag '{old_tag}' renamed to '{new_tag}'."
+
+
 @input_error
 def add_note(notes: Notes) -> str:
     """Add a new note to notes."""
@@ -100,6 +157,8 @@ def add_note(notes: Notes) -> str:
 @input_error
 def change_note(notes: Notes) -> str:
     """Change the existing note by its title."""
+    from InquirerPy import inquirer
+
     title = input("Enter a title: ")
     entity = notes.find_note(title)
     if not entity:
@@ -107,11 +166,14 @@ def change_note(notes: Notes) -> str:
 
     choice = inquirer.select(
         message="Which field would you like to edit?",
-        choices=["Content", "Tags", "Cancel"]
+        choices=["Title", "Content", "Tags", "Cancel"]
     ).execute()
 
     if choice == "Cancel":
         return "Operation cancelled."
+    elif choice == "Title":
+        new_title = color_input("Enter new title: ")
+        return notes.rename_note(title, new_title)
     elif choice == "Content":
         value = color_input("Enter new content: ")
         entity.add_content(value)
@@ -135,7 +197,7 @@ def delete_note(notes: Notes) -> str:
 @input_error
 def find_note(notes: Notes, title: str) -> str | Note:
     """Find the existing note by its title."""
-    if not (note := notes.find_note(title)):
+    if not (note := notes.find_note(title, ignore_case=True)):
         return f"Note with title: '{title}' is not found."
 
     return note
@@ -143,55 +205,106 @@ def find_note(notes: Notes, title: str) -> str | Note:
 
 @input_error
 def show_all_notes(notes: Notes) -> str:
-    """Show all existing notes."""
-    return notes.render_table(notes.get_all(), no_data_str="No notes available.")
+    """Show all existing notes, page by page."""
+    table = PagedTable(notes.table_headers, notes.table_rows(notes.get_all()), no_data_str="No notes available.")
+    show_pages(table)
+    return f"Notes shown: {table.cursor} of {len(notes.get_all())}."
 
 @input_error
 def search_notes(notes: Notes) -> str:
+    from InquirerPy import inquirer
+
     query = color_input("Enter search query: ")
     tag = color_input("Enter tag (optional): ")
 
     order = inquirer.select(
         message="Order: ",
-        choices=["asc", "desc"],
+        choices=["asc", "desc", "best match"],
     ).execute()
 
-    results: list[Note] = notes.search(query, tag, "title", order)
-    return notes.render_table(results, no_data_str="No matching notes found.")
+    if order == "best match":
+        results: Sequence[Note] = notes.fuzzy_search(query, tag, FUZZY_LIMIT)
+    else:
+        results: Sequence[Note] = notes.search(query, tag, "title", order)
+    table = PagedTable(notes.table_headers, notes.table_rows(results), no_data_str="No matching notes found.")
+    show_pages(table)
+    return f"Notes found: {len(results)}."
 
 
+@measured
 def save_data(book: AddressBook, notes: Notes, filename: str = "var/addressbook.pkl") -> None:
-    """Save data to a file using pickle serialization."""
-
-    with open(filename, "wb") as file:
-        data = {"address_book": book, "notes": notes}
-        pickle.dump(data, file)
+    """Save data to a file using pickle serialization and drop the journal it supersedes."""
+    Journal(filename).compact(book, notes)
 
 
+@measured
 def load_data(filename: str = "var/addressbook.pkl") -> (AddressBook, Notes):
-    """Load data from a file using pickle deserialization."""
+    """Load data from a file using pickle deserialization and replay the journal written after it."""
+    return Journal(filename).load()
 
-    try:
-        with open(filename, "rb") as file:
-            data = pickle.load(file)
-            return data.get("address_book", AddressBook()), data.get("notes", Notes())
-    except FileNotFoundError:
-        return AddressBook(), Notes()
+
+def load_store_data(store: "SQLiteStore | ShardedStore", filename: str = "var/addressbook.pkl") -> (AddressBook, Notes):
+    """Open the collections kept in the SQLite or sharded store, importing the pickled data on first use."""
+    if store.is_empty():
+        store.import_collections(*load_data(filename))
+    return AddressBook(store=store), Notes(store=store)
+
+
+def autosave_stats(autosaver: AutoSaver | None) -> dict | None:
+    """Get how long flushing the changes takes and how much is written, None without autosave."""
+    return autosaver.stats if autosaver is not None else None
+
+
+def search_cache_stats(book: AddressBook, notes: Notes) -> dict:
+    """Get the hits and misses of the cached search results of the collections."""
+    return {"contacts": book.search_cache_stats, "notes": notes.search_cache_stats}
+
+
+def show_stats(autosaver: AutoSaver | None, book: AddressBook, notes: Notes) -> str:
+    """Show the command statistics and the autosave ones, and save them to a file if asked."""
+    from InquirerPy import inquirer
+
+    if not instruments.enabled:
+        if inquirer.confirm(message="Command stats are not collected. Start collecting them?", default=False).execute():
+            instruments.enabled = True
+    else:
+        print(instruments.report())
+        print("Latencies are in ms, the commands include the time of the prompts.")
+
+    if autosaver is None:
+        print("Autosave is not used, the changes are saved immediately.")
+    else:
+        print("\n".join(f"{name}: {value}" for name, value in autosaver.stats.items()))
+    for name, stats in search_cache_stats(book, notes).items():
+        print(f"Search cache of {name}: {stats['hits']} hits, {stats['misses']} misses, {stats['size']} of {stats['max_size']} searches kept")
+
+    if instruments.enabled and inquirer.confirm(message="Save the stats to a file?", default=False).execute():
+        filename = inquirer.text(message="File name:", default=STATS_FILE or "var/stats.json").execute()
+        instruments.dump(filename, {"autosave": autosave_stats(autosaver), "search_cache": search_cache_stats(book, notes)})
+        return f"Stats saved to '{filename}'."
+    return ""
 
 
 @input_error
 def search_contacts(book: AddressBook) -> str:
     """Search for contacts by any field."""
+    from InquirerPy import inquirer
+
     query = color_input("Enter search query: ")
     tag = color_input("Enter tag (optional): ")
 
     order = inquirer.select(
         message="Order: ",
-        choices=["asc", "desc"],
+        choices=["asc", "desc", "best match"],
     ).execute()
 
-    results: list[Record] = book.search(query, tag, "name", order)
-    return book.render_table(results, no_data_str="No matching contacts found.")
+    if order == "best match":
+        results: Sequence[Record] = book.fuzzy_search(query, tag, FUZZY_LIMIT)
+    else:
+        results: Sequence[Record] = book.search(query, tag, "name", order)
+    table = PagedTable(book.table_headers, book.table_rows(results), no_data_str="No matching contacts found.")
+    show_pages(table)
+    return f"Contacts found: {len(results)}."
 
 
 @input_error
@@ -258,7 +371,22 @@ def add_contact_interactive(book: AddressBook) -> str:
 
     return message
 
+@input_error
+def import_contacts(book: AddressBook) -> str:
+    """Import contacts from a CSV or vCard file, merging them by name."""
+    from storage.importer import import_file
+
+    filename = color_input("Enter path to the .csv or .vcf file: ")
+    try:
+        report = import_file(book, filename)
+    except OSError as e:
+        return Fore.RED + str(e)
+    return str(report)
+
+
 def edit_tag(record: BaseEntity):
+        from InquirerPy import inquirer
+
         choiced = inquirer.select(
             message="Which tag would you like to edit/remove?",
             choices=['New'] + record.tags + ['Back']
@@ -283,6 +411,9 @@ def edit_tag(record: BaseEntity):
 @input_error
 def edit_contact(book: AddressBook) -> str:
     """Edit an existing contact by updating its fields."""
+    from InquirerPy import inquirer
+    from utils import suggest_name_input
+
     name = suggest_name_input(
         "Enter the name of the contact you want to edit: ", book=book
     )
@@ -318,14 +449,14 @@ def edit_contact(book: AddressBook) -> str:
         if new_phone is None:
             return "Edit operation cancelled."
         if new_phone == "r":
-            record.remove_phone(phone_to_remove_edit)
+            record.remove_phone(phone_to_remove_edit.value)
             return "Phone number removed successfully."
 
         if phone_to_remove_edit == "New":
             record.add_phone(new_phone)
             return "Phone number added successfully."
         else:
-            record.edit_phone(phone_to_remove_edit, new_phone)
+            record.edit_phone(phone_to_remove_edit.value, new_phone)
             return "Phone number updated successfully."
 
     elif field_to_edit == "Email":
@@ -349,9 +480,30 @@ def edit_contact(book: AddressBook) -> str:
 
 def main() -> None:
     """Main function to handle user input and commands."""
+    from InquirerPy import inquirer
+    from utils import suggest_name_input
+
+    init(autoreset=True)
     print(Fore.GREEN + "Welcome to the assistant bot!")
     address_book_file = "var/addressbook.pkl"
-    contacts, notes = load_data(address_book_file)
+    journal = autosaver = None
+    store = batch.open_store(address_book_file)
+    if store is not None:
+        contacts, notes = load_store_data(store, address_book_file)
+    else:
+        journal = Journal(address_book_file)
+        contacts, notes = journal.load()
+        autosaver = AutoSaver(
+            journal,
+            contacts,
+            notes,
+            interval=float(os.environ.get("TRIATEAMO_AUTOSAVE_INTERVAL", 5)),
+            max_changes=int(os.environ.get("TRIATEAMO_AUTOSAVE_CHANGES", 50)),
+        )
+        autosaver.start()
+        if SEARCH_WORKERS:
+            contacts.start_parallel_search(SEARCH_WORKERS)
+            notes.start_parallel_search(SEARCH_WORKERS)
     while True:
         choice = inquirer.select(
             message="Choose an option:",
@@ -360,55 +512,87 @@ def main() -> None:
                 "Change contact",
                 "Delete contact",
                 "Show all contacts",
+                "Import contacts",
                 "Show birthday",
                 "Show upcoming birthdays",
                 "Search contacts",
+                "Reverse phone lookup",
                 "Add note",
                 "Change note",
                 "Delete note",
                 "Find note",
                 "Show all notes",
                 "Search notes",
+                "Rename tag",
+                "Show stats",
                 "Exit",
             ],
         ).execute()
 
         if choice == "Exit":
-            save_data(contacts, notes, address_book_file)
+            if autosaver:
+                autosaver.stop()
+            contacts.stop_parallel_search()
+            notes.stop_parallel_search()
+            if journal:
+                journal.compact()
+            if store:
+                store.close()
+            if STATS_FILE and instruments.enabled:
+                instruments.dump(
+                    STATS_FILE, {"autosave": autosave_stats(autosaver), "search_cache": search_cache_stats(contacts, notes)}
+                )
             print("Good bye!")
             break
-        elif choice == "Add contact":
-            print(add_contact_interactive(contacts))
-        elif choice == "Change contact":
-            print(edit_contact(contacts))
-        elif choice == "Delete contact":
-            args = suggest_name_input("Enter contact name to delete: ", book=contacts).split()
-            print(delete_contact(args, contacts))
-        elif choice == "Show all contacts":
-            print(show_all_contacts(contacts))
-        elif choice == "Show birthday":
-            args = suggest_name_input("Enter contact name: ", book=contacts).split()
-            print(show_birthday(args, contacts))
-        elif choice == "Show upcoming birthdays":
-            args = input("Enter number of days to check: ").split()
-            print(birthdays(args, contacts))
-        elif choice == "Search contacts":
-            print(search_contacts(contacts))
-        elif choice == "Add note":
-            print(add_note(notes))
-        elif choice == "Change note":
-            print(change_note(notes))
-        elif choice == "Delete note":
-            print(delete_note(notes))
-        elif choice == "Find note":
-            title = input("Enter the title to search for: ")
-            print(find_note(notes, title))
-        elif choice == "Show all notes":
-            print(show_all_notes(notes))
-        elif choice == "Search notes":
-            print(search_notes(notes))
+
+        # the autosave thread applies the changes of the other processes between the commands only
+        with autosaver.holding() if autosaver else nullcontext():
+            if choice == "Add contact":
+                print(add_contact_interactive(contacts))
+            elif choice == "Change contact":
+                print(edit_contact(contacts))
+            elif choice == "Delete contact":
+                args = suggest_name_input("Enter contact name to delete: ", book=contacts).split()
+                print(delete_contact(args, contacts))
+            elif choice == "Show all contacts":
+                print(show_all_contacts(contacts))
+            elif choice == "Import contacts":
+                print(import_contacts(contacts))
+            elif choice == "Show birthday":
+                args = suggest_name_input("Enter contact name: ", book=contacts).split()
+                print(show_birthday(args, contacts))
+            elif choice == "Show upcoming birthdays":
+                args = input("Enter number of days to check: ").split()
+                print(birthdays(args, contacts))
+            elif choice == "Search contacts":
+                print(search_contacts(contacts))
+            elif choice == "Reverse phone lookup":
+                print(lookup_phone(contacts))
+            elif choice == "Add note":
+                print(add_note(notes))
+            elif choice == "Change note":
+                print(change_note(notes))
+            elif choice == "Delete note":
+                print(delete_note(notes))
+            elif choice == "Find note":
+                title = input("Enter the title to search for: ")
+                print(find_note(notes, title))
+            elif choice == "Show all notes":
+                print(show_all_notes(notes))
+            elif choice == "Search notes":
+                print(search_notes(notes))
+            elif choice == "Rename tag":
+                print(rename_tag(contacts, notes))
+            elif choice == "Show stats":
+                print(show_stats(autosaver, contacts, notes))
         print()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Triateamo contacts and notes assistant.")
+    parser.add_argument("--batch", metavar="FILE", help="run the JSON line commands from FILE ('-' for stdin) without the menu")
+    parser.add_argument("--save-every", type=int, default=0, metavar="N", help="save the changes after every N batch commands")
+    args = parser.parse_args()
+    if args.batch:
+        sys.exit(batch.main(args.batch, args.save_every))
     main()
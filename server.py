@@ -0,0 +1,349 @@
+"""Serve the address book and notes to other local programs over HTTP with JSON.
+
+One process keeps the collections in memory, so the clients do not load the
+saved data every time. The routes run the `batch` commands:
+
+    GET    /contacts?query=&tag=&fuzzy=&limit=&order=   search-contacts
+    POST   /contacts                                    add-contact
+    GET    /contacts/<name>                             find-contact
+    PATCH  /contacts/<name>                             edit-contact
+    DELETE /contacts/<name>                             delete-contact
+    GET    /phones/<phone>?prefix=&limit=               lookup-phone
+    GET    /birthdays?days=                             birthdays
+    GET    /notes?query=&tag=&fuzzy=&limit=&order=      search-notes
+    POST   /notes                                       add-note
+    GET    /notes/<title>?ignore_case=                  find-note
+    PATCH  /notes/<title>                               edit-note
+    DELETE /notes/<title>                               delete-note
+    POST   /tags/rename                                 rename-tag
+    GET    /stats                                       request, autosave and search cache statistics
+
+The arguments are taken from the query string and the JSON body, the
+response is `{"ok": true, "result": ...}` or `{"ok": false, "error": "..."}`
+like the batch results. The commands check the types of the arguments, so a
+wrong-typed one, e.g. `{"address": null}`, gets a 400 response.
+
+Run from the project root:
+
+    python server.py --port 8080
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from batch import open_collections, run_command
+from fields.address_book import AddressBook
+from fields.notes import Notes
+from instrumentation import instruments
+from storage import AutoSaver, Journal
+
+ROUTES = {
+    ("GET", "contacts", False): "search-contacts",
+    ("POST", "contacts", False): "add-contact",
+    ("GET", "contacts", True): "find-contact",
+    ("PATCH", "contacts", True): "edit-contact",
+    ("DELETE", "contacts", True): "delete-contact",
+    ("GET", "phones", True): "lookup-phone",
+    ("GET", "birthdays", False): "birthdays",
+    ("GET", "notes", False): "search-notes",
+    ("POST", "notes", False): "add-note",
+    ("GET", "notes", True): "find-note",
+    ("PATCH", "notes", True): "edit-note",
+    ("DELETE", "notes", True): "delete-note",
+}
+# the argument taken from the path, e.g. the name in /contacts/<name>
+PATH_ARGS = {"contacts": "name", "notes": "title", "phones": "phone"}
+WRITE_OPS = {"add-contact", "edit-contact", "delete-contact", "add-note", "edit-note", "delete-note", "rename-tag"}
+INT_PARAMS = {"limit", "days"}
+BOOL_PARAMS = {"fuzzy", "prefix", "ignore_case"}
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+}
+MAX_BODY = 1 << 20
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def parse_command(method: str, target: str, body: bytes) -> dict:
+    """Get the batch command for the request, raise HttpError for unknown routes and invalid arguments."""
+    url = urlsplit(target)
+    parts = [unquote(part) for part in url.path.strip("/").split("/")]
+    if parts == ["tags", "rename"]:
+        if method != "POST":
+            raise HttpError(405, f"Method {method} is not allowed for {url.path}.")
+        op = "rename-tag"
+    elif len(parts) in (1, 2) and parts[0] in ("contacts", "notes", "phones", "birthdays"):
+        resource, has_key = parts[0], len(parts) == 2
+        op = ROUTES.get((method, resource, has_key))
+        if op is None:
+            if any(key[1:] == (resource, has_key) for key in ROUTES):
+                raise HttpError(405, f"Method {method} is not allowed for {url.path}.")
+            raise HttpError(404, f"Unknown route {url.path}.")
+    else:
+        raise HttpError(404, f"Unknown route {url.path}.")
+
+    command = {}
+    if body:
+        try:
+            command = json.loads(body)
+        except ValueError:
+            raise HttpError(400, "The body should be a JSON object.")
+        if not isinstance(command, dict):
+            raise HttpError(400, "The body should be a JSON object.")
+    for name, value in parse_qsl(url.query):
+        if name in INT_PARAMS:
+            try:
+                value = int(value)
+            except ValueError:
+                raise HttpError(400, f"The '{name}' parameter should be a number.")
+        elif name in BOOL_PARAMS:
+            value = value.lower() in ("1", "true", "yes")
+        command[name] = value
+    if len(parts) == 2 and parts[0] in PATH_ARGS:
+        command[PATH_ARGS[parts[0]]] = parts[1]
+    command["op"] = op
+    return command
+
+
+class ApiServer:
+    """HTTP/JSON server over one in-memory address book and notes.
+
+    The commands run on the event loop one at a time, so the reads of many
+    connections are interleaved but never see a half-made change. The writes
+    also take `_write_lock`, which the background flush of the changes to the
+    journal holds while it runs in a thread, so the entities are not changed
+    while they are written. The reads go on during the flush. The changes
+    saved by other processes using the same files are applied on the loop
+    before it, holding the lock of the files until the write is done.
+    """
+
+    def __init__(
+        self,
+        book: AddressBook,
+        notes: Notes,
+        journal: Journal | None = None,
+        interval: float = 5.0,
+        max_changes: int = 50,
+    ) -> None:
+        self.book = book
+        self.notes = notes
+        self.journal = journal
+        # only its flush() and stats are used, the server schedules the flushes itself
+        self.autosaver = AutoSaver(journal, book, notes) if journal is not None else None
+        self.interval = interval
+        self.max_changes = max_changes
+        self.requests = 0
+        self.errors = 0
+        self._changes = 0
+        self._write_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "autosave": self.autosaver.stats if self.autosaver else None,
+            "search_cache": {"contacts": self.book.search_cache_stats, "notes": self.notes.search_cache_stats},
+            "operations": instruments.to_dict() if instruments.enabled else None,
+        }
+
+    async def execute(self, command: dict) -> object:
+        """Run the batch command, the writes one after another."""
+        if command["op"] not in WRITE_OPS:
+            return run_command(self.book, self.notes, command)
+        async with self._write_lock:
+            result = run_command(self.book, self.notes, command)
+        self._changes += 1
+        if self._changes >= self.max_changes:
+            self._wakeup.set()
+        return result
+
+    async def flush(self) -> None:
+        """Write the changed contacts and notes to the journal without blocking the reads."""
+        if self.autosaver is None:
+            return
+        async with self._write_lock:
+            self._changes = 0
+            batch = self.autosaver.take_batch()
+            if not batch:
+                self.journal.refresh()
+                return
+            # waiting for the other processes writing the files does not block the loop
+            await asyncio.to_thread(self.journal.lock.acquire)
+            try:
+                # the changes of the other processes are applied here, not along with the reads in the thread
+                self.journal.refresh(batch)
+                # only the file is written in the thread
+                await asyncio.to_thread(self.autosaver.write_batch, batch)
+            finally:
+                self.journal.lock.release()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        """Serve the requests until cancelled, then flush the changes."""
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        persist = asyncio.create_task(self._persist())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            persist.cancel()
+            await self.flush()
+
+    async def _persist(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # not cancelled halfway, the lock is released once the thread writing the file is done
+            await asyncio.shield(self.flush())
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    self._write_response(writer, e.status, {"ok": False, "error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, target, body, keep_alive = request
+                status, response = await self._respond(method, target, body)
+                self._write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, target: str, body: bytes) -> tuple[int, dict]:
+        self.requests += 1
+        try:
+            if method == "GET" and urlsplit(target).path.rstrip("/") == "/stats":
+                return 200, {"ok": True, "result": self.stats}
+            result = await self.execute(parse_command(method, target, body))
+            return 200, {"ok": True, "result": result}
+        except HttpError as e:
+            status, error = e.status, str(e)
+        except KeyError as e:
+            error = str(e.args[0]) if e.args else str(e)
+            status = 404 if "not found" in error else 409
+        except (ValueError, TypeError) as e:
+            status, error = 400, str(e)
+        self.errors += 1
+        return status, {"ok": False, "error": error}
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes, bool] | None:
+        """Read the method, target, body and whether to keep the connection, None when it is closed."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HttpError(400, "Incomplete request.")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(413, "The request headers are too large.")
+
+        request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+        try:
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            raise HttpError(400, "Invalid request line.")
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length.")
+        if length > MAX_BODY:
+            raise HttpError(413, "The request body is too large.")
+        body = await reader.readexactly(length) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method.upper(), target, body, keep_alive
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, response: dict, keep_alive: bool) -> None:
+        body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+            + body
+        )
+
+
+def main(host: str = "127.0.0.1", port: int = 8080, address_book_file: str = "var/addressbook.pkl") -> None:
+    """Serve the saved collections until interrupted, then save them."""
+    book, notes, journal, store = open_collections(address_book_file)
+    workers = int(os.environ.get("TRIATEAMO_SEARCH_WORKERS", 0))
+    if workers and store is None:
+        book.start_parallel_search(workers)
+        notes.start_parallel_search(workers)
+    server = ApiServer(
+        book,
+        notes,
+        journal,
+        interval=float(os.environ.get("TRIATEAMO_AUTOSAVE_INTERVAL", 5)),
+        max_changes=int(os.environ.get("TRIATEAMO_AUTOSAVE_CHANGES", 50)),
+    )
+
+    async def serve() -> None:
+        task = asyncio.create_task(server.serve(host, port))
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+        except NotImplementedError:
+            # no signal handlers on Windows, Ctrl+C still stops the server
+            pass
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    print(f"Serving on http://{host}:{port}")
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        book.stop_parallel_search()
+        notes.stop_parallel_search()
+        if journal is not None:
+            # the changes are flushed when serve() ends, the snapshot makes the next start fast
+            journal.compact()
+        if store is not None:
+            store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the Triateamo contacts and notes over HTTP with JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--file", default="var/addressbook.pkl", help="the saved address book")
+    args = parser.parse_args()
+    main(args.host, args.port, args.file)
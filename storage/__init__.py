@@ -0,0 +1,36 @@
+from importlib import import_module
+
+# the submodules are imported on first use, e.g. the columnar snapshot, SQLite and the shards only when used
+_EXPORTS = {
+    "AutoSaver": ".autosave",
+    "ColumnarSnapshot": ".columnar",
+    "Journal": ".journal",
+    "SQLiteStore": ".sqlite_store",
+    "ShardedStore": ".sharded",
+    "convert_pickle": ".columnar",
+    "read_snapshot": ".snapshot",
+    "shard_pickle": ".sharded",
+    "write_columnar": ".columnar",
+    "write_snapshot": ".snapshot",
+}
+
+__all__ = [
+    "AutoSaver",
+    "ColumnarSnapshot",
+    "Journal",
+    "SQLiteStore",
+    "ShardedStore",
+    "convert_pickle",
+    "read_snapshot",
+    "shard_pickle",
+    "write_columnar",
+    "write_snapshot",
+]
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
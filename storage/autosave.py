@@ -0,0 +1,125 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from fields.address_book import AddressBook
+from fields.base_collection import BaseCollection
+from fields.notes import Notes
+from .journal import Journal
+
+
+class AutoSaver:
+    """Background thread writing the changed contacts and notes to the journal.
+
+    The changes are flushed every `interval` seconds or as soon as
+    `max_changes` changes are made, whichever comes first. Only the entities
+    changed since the previous flush are written. A flush also applies the
+    changes saved by the other processes to the collections, so the callers
+    using them from another thread hold `holding()` meanwhile.
+    """
+
+    def __init__(
+        self,
+        journal: Journal,
+        book: AddressBook,
+        notes: Notes,
+        interval: float = 5.0,
+        max_changes: int = 50,
+    ) -> None:
+        self.journal = journal
+        self.interval = interval
+        self.max_changes = max_changes
+        self._collections: dict[str, BaseCollection] = {"contacts": book, "notes": notes}
+        self._changes = 0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+        self.flushes = 0
+        self.entities_written = 0
+        self.bytes_written = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def start(self) -> None:
+        for collection in self._collections.values():
+            collection.add_observer(self._changed)
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread and flush the remaining changes."""
+        for collection in self._collections.values():
+            collection.remove_observer(self._changed)
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    @contextmanager
+    def holding(self):
+        """Keep the flushes waiting while the caller reads or changes the collections, e.g. a menu command."""
+        with self._flush_lock:
+            yield
+
+    def flush(self) -> None:
+        """Write the entities changed since the previous flush to the journal."""
+        with self._flush_lock:
+            batch = self.take_batch()
+            if not batch:
+                # pick up the changes saved by the other processes meanwhile
+                self.journal.refresh()
+                return
+            self._write(self.journal.append_batch, batch)
+
+    def take_batch(self) -> list[tuple[str, str, str, tuple]]:
+        """Take the entities changed since the previous flush as the journal changes."""
+        self._changes = 0
+        batch = []
+        for name, collection in self._collections.items():
+            changed, deleted = collection.take_changes()
+            batch += [(name, "delete", key, ()) for key in deleted]
+            batch += [(name, "put", entity.key, (entity,)) for entity in changed]
+        return batch
+
+    def write_batch(self, batch: list[tuple[str, str, str, tuple]]) -> None:
+        """Write the taken changes, holding the journal lock after `Journal.refresh(batch)`."""
+        self._write(self.journal.write_batch, batch)
+
+    def _write(self, write, batch: list[tuple[str, str, str, tuple]]) -> None:
+        started = time.perf_counter()
+        self.bytes_written += write(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.entities_written += len(batch)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+
+    @property
+    def stats(self) -> dict:
+        """Flush statistics to tune the interval and the number of changes."""
+        return {
+            "flushes": self.flushes,
+            "entities_written": self.entities_written,
+            "bytes_written": self.bytes_written,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+        }
+
+    def _changed(self, collection: BaseCollection, event: str, key: str, args: tuple) -> None:
+        self._changes += 1
+        if self._changes >= self.max_changes:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if not self._stopped.is_set():
+                self.flush()
@@ -0,0 +1,295 @@
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Callable, Iterator
+
+from fields.address_book import AddressBook
+from fields.birthday import format_date
+from fields.record import Record
+from .lazy import StoredRecords
+from .snapshot import read_snapshot
+
+MAGIC = b"TRCS"
+VERSION = 2
+NONE = 0xFFFFFFFF
+
+# the sections follow the header in this order, each one aligned to 8 bytes
+SECTIONS = (
+    ("string_offsets", "Q"),  # strings + 1 offsets into string_data
+    ("string_data", "B"),  # UTF-8 encoded strings
+    ("names", "I"),  # string id per row
+    ("emails", "I"),  # string id per row or NONE
+    ("addresses", "I"),  # string id per row or NONE
+    ("birthdays", "i"),  # date ordinal per row or 0
+    ("birthday_mds", "H"),  # month * 100 + day per row or 0
+    ("phone_offsets", "I"),  # rows + 1 offsets into phones
+    ("phones", "I"),  # string ids
+    ("tag_offsets", "I"),  # rows + 1 offsets into tags
+    ("tags", "I"),  # string ids
+    ("name_order", "I"),  # row numbers sorted by name
+    ("tag_ids", "I"),  # string ids of all distinct tags
+    ("phone_rows", "I"),  # row number per phone
+    ("phone_order", "I"),  # indices into phones sorted by the number, then by name
+    ("birthday_order", "I"),  # numbers of the rows with a birthday sorted by birthday_mds
+)
+# magic, version, byte order, rows, then offset and length of every section
+HEADER = struct.Struct("<4sIcxxxI" + "QQ" * len(SECTIONS))
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def write_columnar(book: AddressBook, filename: str) -> None:
+    """Write the records of the address book to the columnar snapshot file."""
+    string_ids: dict[str, int] = {}
+    string_data = bytearray()
+    string_offsets = array("Q", [0])
+
+    def string_id(value: str | None) -> int:
+        if value is None:
+            return NONE
+        if value not in string_ids:
+            string_ids[value] = len(string_ids)
+            string_data.extend(value.encode("utf-8"))
+            string_offsets.append(len(string_data))
+        return string_ids[value]
+
+    columns = {name: array(typecode) for name, typecode in SECTIONS}
+    columns["phone_offsets"].append(0)
+    columns["tag_offsets"].append(0)
+    tag_ids: dict[int, None] = {}
+
+    for record in book.data.values():
+        columns["names"].append(string_id(record.name.value))
+        columns["emails"].append(string_id(record.email.value if record.email else None))
+        columns["addresses"].append(string_id(record.address.value if record.address else None))
+        birthday = record.birthday.date.date() if record.birthday else None
+        columns["birthdays"].append(birthday.toordinal() if birthday else 0)
+        columns["birthday_mds"].append(birthday.month * 100 + birthday.day if birthday else 0)
+        columns["phones"].extend(string_id(phone.value) for phone in record.phones)
+        columns["phone_rows"].extend([len(columns["names"]) - 1] * len(record.phones))
+        columns["phone_offsets"].append(len(columns["phones"]))
+        for tag in getattr(record, "tags", []):
+            tag_id = string_id(tag.value)
+            columns["tags"].append(tag_id)
+            tag_ids[tag_id] = None
+        columns["tag_offsets"].append(len(columns["tags"]))
+
+    def string_bytes(string: int) -> bytes:
+        return bytes(string_data[string_offsets[string]:string_offsets[string + 1]])
+
+    names = columns["names"]
+    # UTF-8 bytes sort in the same order as the strings they encode
+    columns["name_order"].extend(sorted(range(len(names)), key=lambda row: string_bytes(names[row])))
+    phones, phone_rows = columns["phones"], columns["phone_rows"]
+    columns["phone_order"].extend(sorted(
+        range(len(phones)), key=lambda index: (string_bytes(phones[index]), string_bytes(names[phone_rows[index]])),
+    ))
+    birthday_mds = columns["birthday_mds"]
+    columns["birthday_order"].extend(sorted((row for row in range(len(names)) if birthday_mds[row]), key=birthday_mds.__getitem__))
+    columns["tag_ids"].extend(tag_ids)
+    columns["string_offsets"] = string_offsets
+    columns["string_data"] = array("B", string_data)
+
+    sections = []
+    offset = _align(HEADER.size)
+    for name, _ in SECTIONS:
+        data = columns[name].tobytes()
+        sections.append((offset, len(columns[name]), data))
+        offset = _align(offset + len(data))
+
+    byteorder = b"L" if sys.byteorder == "little" else b"B"
+    header = HEADER.pack(
+        MAGIC, VERSION, byteorder, len(names),
+        *(value for offset, length, _ in sections for value in (offset, length)),
+    )
+    with open(filename, "wb") as file:
+        file.write(header)
+        for offset, _, data in sections:
+            file.write(b"\0" * (offset - file.tell()))
+            file.write(data)
+
+
+def convert_pickle(pickle_filename: str, filename: str) -> None:
+    """Convert the address book from the pickled snapshot into the columnar snapshot."""
+    book, _, _, _ = read_snapshot(pickle_filename)
+    write_columnar(book, filename)
+
+
+class ColumnarSnapshot:
+    """Read-only address book snapshot mapped into memory.
+
+    The columns are read straight from the mapped file and the rows are decoded
+    only when they are accessed, so opening the snapshot does not depend on its
+    size. Pass it as the `store` of `AddressBook` to query it. It is an API
+    for the scripts reading large address books: the menu, the batch mode and
+    the server keep using the pickle, SQLite or shard files, which they write.
+    """
+
+    # the tags of its contacts are not renamed, see `BaseCollection._check_tag_rename()`
+    read_only = True
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        with open(filename, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byteorder, self.rows, *sections = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"'{filename}' is not a columnar snapshot.")
+        if byteorder != (b"L" if sys.byteorder == "little" else b"B"):
+            self._mmap.close()
+            raise ValueError(f"'{filename}' was written on a machine with another byte order.")
+
+        self._view = memoryview(self._mmap)
+        self._columns = {}
+        for index, (name, typecode) in enumerate(SECTIONS):
+            offset, length = sections[2 * index], sections[2 * index + 1]
+            size = array(typecode).itemsize
+            self._columns[name] = self._view[offset:offset + length * size].cast(typecode)
+
+        self._tag_ids = {self.string(tag_id): tag_id for tag_id in self._columns["tag_ids"]}
+
+    def close(self) -> None:
+        for column in self._columns.values():
+            column.release()
+        self._view.release()
+        self._mmap.close()
+
+    def string(self, string_id: int) -> str | None:
+        if string_id == NONE:
+            return None
+        offsets = self._columns["string_offsets"]
+        return str(self._columns["string_data"][offsets[string_id]:offsets[string_id + 1]], "utf-8")
+
+    def name(self, row: int) -> str:
+        return self.string(self._columns["names"][row])
+
+    def row(self, row: int) -> Record:
+        """Decode the record stored in the row."""
+        columns = self._columns
+        phones = columns["phones"][columns["phone_offsets"][row]:columns["phone_offsets"][row + 1]]
+        tags = columns["tags"][columns["tag_offsets"][row]:columns["tag_offsets"][row + 1]]
+        birthday = columns["birthdays"][row]
+        return Record.from_dict({
+            "name": self.name(row),
+            "phones": [self.string(phone) for phone in phones],
+            "email": self.string(columns["emails"][row]),
+            "address": self.string(columns["addresses"][row]),
+            "birthday": format_date(date.fromordinal(birthday)) if birthday else None,
+            "tags": [self.string(tag) for tag in tags],
+        })
+
+    def find_row(self, name: str) -> int | None:
+        """Find the row of the record by name with a binary search over the sorted names."""
+        order = self._columns["name_order"]
+        index = bisect_left(range(self.rows), name, key=lambda i: self.name(order[i]))
+        if index < self.rows and self.name(order[index]) == name:
+            return order[index]
+        return None
+
+    def record_mapping(self, on_load: Callable[[Record], None]) -> StoredRecords:
+        """Get the mapping to use as `AddressBook.data`, `on_load` is called for every decoded record."""
+        return StoredRecords(self, on_load)
+
+    def record_names(self) -> Iterator[str]:
+        return (self.name(row) for row in range(self.rows))
+
+    def count_records(self) -> int:
+        return self.rows
+
+    def has_record(self, name: str) -> bool:
+        return self.find_row(name) is not None
+
+    def load_record(self, name: str) -> Record | None:
+        row = self.find_row(name)
+        return None if row is None else self.row(row)
+
+    def save_record(self, record: Record) -> None:
+        raise ValueError("The columnar snapshot is read-only.")
+
+    def delete_record(self, name: str) -> None:
+        raise ValueError("The columnar snapshot is read-only.")
+
+    def rename_tag(self, old_tag: str, new_tag: str) -> None:
+        """Allow renaming the tags of the other collections, the ones of the snapshot are rejected before."""
+        if old_tag in self._tag_ids:
+            raise ValueError("The columnar snapshot is read-only.")
+
+    def search_records(self, query: str, tag: str = "") -> list[str]:
+        """Get the names of the contacts matching the lowercased query and the tag."""
+        columns = self._columns
+        tag_id = self._tag_ids.get(tag, NONE) if tag else None
+        if tag_id == NONE:
+            return []
+
+        names = []
+        for row in range(self.rows):
+            if tag_id is not None and tag_id not in columns["tags"][columns["tag_offsets"][row]:columns["tag_offsets"][row + 1]]:
+                continue
+            if query and not self._row_matches(row, query):
+                continue
+            names.append(self.name(row))
+        return names
+
+    def phone_names(self, phone: str, prefix: bool = False) -> list[str]:
+        """Get the names of the contacts with the phone number or a number starting with it.
+
+        A binary search over the sorted numbers, they are ordered by the number
+        for a prefix, like in the SQLite store, and by name for one number.
+        """
+        columns = self._columns
+        phones, order, rows = columns["phones"], columns["phone_order"], columns["phone_rows"]
+        # the prefixes of the sorted numbers are sorted too
+        length = len(phone) if prefix else None
+
+        def number(index: int) -> str:
+            return self.string(phones[order[index]])[:length]
+
+        start = bisect_left(range(len(order)), phone, key=number)
+        end = bisect_right(range(len(order)), phone, lo=start, key=number)
+        return list(dict.fromkeys(self.name(rows[order[index]]) for index in range(start, end)))
+
+    def birthday_names(self, start_md: int, end_md: int) -> list[str]:
+        """Get the names of the contacts with the birthday between two MMDD values, wrapping at year end.
+
+        A binary search over the rows sorted by the birthday, the names are in
+        the order of the rows, like in the SQLite store.
+        """
+        columns = self._columns
+        order, birthday_mds = columns["birthday_order"], columns["birthday_mds"]
+
+        def birthday_md(index: int) -> int:
+            return birthday_mds[order[index]]
+
+        def rows(low: int, high: int) -> list[int]:
+            indices = range(len(order))
+            return list(order[bisect_left(indices, low, key=birthday_md):bisect_right(indices, high, key=birthday_md)])
+
+        found = rows(start_md, end_md) if start_md <= end_md else rows(start_md, 1231) + rows(0, end_md)
+        return [self.name(row) for row in sorted(found)]
+
+    def _row_matches(self, row: int, query: str) -> bool:
+        columns = self._columns
+        if query in self.name(row).lower():
+            return True
+        for phone in columns["phones"][columns["phone_offsets"][row]:columns["phone_offsets"][row + 1]]:
+            if query in self.string(phone):
+                return True
+        for column in ("emails", "addresses"):
+            value = self.string(columns[column][row])
+            if value and query in value.lower():
+                return True
+        birthday = columns["birthdays"][row]
+        return bool(birthday) and query in format_date(date.fromordinal(birthday))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python -m storage.columnar <addressbook.pkl> <addressbook.snap>")
+    convert_pickle(sys.argv[1], sys.argv[2])
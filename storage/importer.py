@@ -0,0 +1,204 @@
+import csv
+import re
+import time
+from datetime import datetime
+from itertools import islice
+from typing import IO, Iterable, Iterator
+
+from fields.address import Address
+from fields.address_book import AddressBook
+from fields.birthday import Birthday, format_date
+from fields.email import Email
+from fields.phone import Phone
+from fields.record import Record
+from fields.tag import Tag
+from fields.validators import validate_name, validate_phone, validate_email, validate_address, validate_birthday, validate_tags
+
+BATCH_SIZE = 1000
+
+
+class ImportReport:
+    """Summary of the import, keeps at most `max_errors` error messages."""
+
+    def __init__(self, max_errors: int = 100) -> None:
+        self.rows = 0
+        self.added = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: list[str] = []
+        self.max_errors = max_errors
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def add_error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f"Row {line}: {message}")
+
+    def __str__(self) -> str:
+        lines = [
+            f"Rows processed: {self.rows} ({self.rows_per_second:.0f} rows/s)",
+            f"Contacts added: {self.added}, updated: {self.updated}, rows failed: {self.failed}",
+        ]
+        lines += self.errors
+        if self.failed > len(self.errors):
+            lines.append(f"... and {self.failed - len(self.errors)} more errors")
+        return "\n".join(lines)
+
+
+def _split(value: str | None, separators: str = ";,") -> list[str]:
+    return [part.strip() for part in re.split(f"[{separators}]", value or "") if part.strip()]
+
+
+def _clean_phone(value: str) -> str:
+    return re.sub(r"[\s().-]", "", value)
+
+
+def read_csv(file: IO[str]) -> Iterator[dict]:
+    """Read the contacts from CSV with the name, phones, email, address, birthday and tags columns.
+
+    Phones and tags are separated by semicolons or commas, like in the contacts table.
+    """
+    reader = csv.DictReader(file)
+    for row in reader:
+        row = {(key or "").strip().lower(): value for key, value in row.items()}
+        yield {
+            "line": reader.line_num,
+            "name": (row.get("name") or "").strip(),
+            "phones": [_clean_phone(phone) for phone in _split(row.get("phones") or row.get("phone"))],
+            "email": (row.get("email") or "").strip(),
+            "address": (row.get("address") or "").strip(),
+            "birthday": (row.get("birthday") or "").strip(),
+            "tags": _split(row.get("tags"), ";, "),
+        }
+
+
+def _unfold(file: IO[str]) -> Iterator[tuple[int, str]]:
+    """Join the folded vCard lines, yielding the number of the first line of each."""
+    current, start = None, 0
+    for number, line in enumerate(file, start=1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, number
+    if current is not None:
+        yield start, current
+
+
+def _vcard_birthday(value: str) -> str:
+    for date_format in ("%Y-%m-%d", "%Y%m%d", "%d.%m.%Y"):
+        try:
+            return format_date(datetime.strptime(value, date_format))
+        except ValueError:
+            pass
+    return value
+
+
+def read_vcard(file: IO[str]) -> Iterator[dict]:
+    """Read the contacts from vCard, taking FN, TEL, EMAIL, ADR, BDAY and CATEGORIES."""
+    row = None
+    for line_number, line in _unfold(file):
+        prop, _, value = line.partition(":")
+        name = prop.split(";")[0].split(".")[-1].upper()
+        if name == "BEGIN" and value.upper() == "VCARD":
+            row = {"line": line_number, "name": "", "phones": [], "email": "", "address": "", "birthday": "", "tags": []}
+        elif row is None:
+            continue
+        elif name == "END":
+            yield row
+            row = None
+        elif name == "FN":
+            row["name"] = value.strip()
+        elif name == "TEL":
+            row["phones"].append(_clean_phone(value.removeprefix("tel:")))
+        elif name == "EMAIL" and not row["email"]:
+            row["email"] = value.strip()
+        elif name == "ADR" and not row["address"]:
+            row["address"] = ", ".join(part.strip() for part in value.split(";") if part.strip())
+        elif name == "BDAY":
+            row["birthday"] = _vcard_birthday(value.strip())
+        elif name == "CATEGORIES":
+            row["tags"] += _split(value, ",")
+
+
+def _validate(row: dict) -> dict:
+    """Check the row with the validators and the field classes, raise ValueError for invalid data."""
+    if not validate_name(row["name"]):
+        raise ValueError(f"Invalid name '{row['name']}'. Please use only letters.")
+    for phone in row["phones"]:
+        if not validate_phone(phone):
+            raise ValueError(f"Invalid phone number '{phone}'.")
+    if row["email"] and not validate_email(row["email"]):
+        raise ValueError(f"Invalid email address '{row['email']}'.")
+    if row["address"] and not validate_address(row["address"]):
+        raise ValueError(f"Invalid address '{row['address']}'.")
+    if row["birthday"] and not validate_birthday(row["birthday"]):
+        raise ValueError(f"Invalid birthday '{row['birthday']}'. Use DD.MM.YYYY")
+    if not validate_tags(row["tags"]):
+        raise ValueError("Invalid tags. The tag should be between 3 and 10 characters long.")
+
+    return {
+        "name": row["name"],
+        "phones": [Phone(phone).value for phone in row["phones"]],
+        "email": Email(row["email"]).value if row["email"] else None,
+        "address": Address(row["address"]).value if row["address"] else None,
+        "birthday": Birthday(row["birthday"]).value if row["birthday"] else None,
+        "tags": [Tag(tag).value for tag in row["tags"]],
+    }
+
+
+def _validate_batch(batch: list[dict], report: ImportReport) -> Iterator[dict]:
+    for row in batch:
+        try:
+            yield _validate(row)
+        except ValueError as e:
+            report.add_error(row["line"], str(e))
+
+
+def _merge(book: AddressBook, contact: dict, report: ImportReport) -> None:
+    """Add the contact to the address book or merge it into the record with the same name."""
+    record = book.find(contact["name"])
+    if record is None:
+        book.add(Record.from_dict(contact))
+        report.added += 1
+        return
+
+    for phone in contact["phones"]:
+        if record.find_phone(phone) is None:
+            record.add_phone(phone)
+    contact["email"] and record.add_email(contact["email"])
+    contact["address"] and record.add_address(contact["address"])
+    contact["birthday"] and record.add_birthday(contact["birthday"])
+    contact["tags"] and record.add_tags(contact["tags"])
+    report.updated += 1
+
+
+def import_contacts(book: AddressBook, rows: Iterable[dict], batch_size: int = BATCH_SIZE) -> ImportReport:
+    """Validate the rows in batches and merge the valid ones into the address book.
+
+    Invalid rows are reported and skipped. Only one batch is held in memory,
+    so any number of rows can be imported.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        report.rows += len(batch)
+        for contact in _validate_batch(batch, report):
+            _merge(book, contact, report)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def import_file(book: AddressBook, filename: str, batch_size: int = BATCH_SIZE) -> ImportReport:
+    """Import the contacts from a .csv or .vcf file."""
+    with open(filename, encoding="utf-8-sig", newline="") as file:
+        if filename.lower().endswith((".vcf", ".vcard")):
+            return import_contacts(book, read_vcard(file), batch_size)
+        return import_contacts(book, read_csv(file), batch_size)
@@ -0,0 +1,245 @@
+import json
+import os
+from contextlib import ExitStack
+
+from fields.address_book import AddressBook
+from fields.base_collection import BaseCollection
+from fields.base_entity import BaseEntity
+from fields.notes import Notes
+from .locking import FileLock
+from .snapshot import read_snapshot, read_snapshot_stamp, write_snapshot
+
+# the events which change the key of the entity to the first argument
+RENAME_EVENTS = ("change_name", "change_title")
+
+
+def journal_filename(snapshot_filename: str) -> str:
+    """Get the name of the journal file kept next to the snapshot file."""
+    return os.path.splitext(snapshot_filename)[0] + ".journal"
+
+
+def lock_filename(snapshot_filename: str) -> str:
+    """Get the name of the file locked by the processes writing the snapshot and the journal."""
+    return os.path.splitext(snapshot_filename)[0] + ".lock"
+
+
+class Journal:
+    """Write-ahead journal of the changes made to the address book and notes.
+
+    The `AutoSaver` appends the changes to the journal file in batches, one
+    JSON line per change, synced to the disk once per batch, so the cost of
+    saving depends on the size of the changes only.
+    Once `compact_every` entries are written, the collections are saved to the
+    snapshot file and the journal is replaced by an empty one.
+
+    Several processes may use the same files. Writing takes the advisory lock
+    on the lock file and first applies the changes the other processes saved
+    since, see `refresh()`, so no change is overwritten. Every compaction
+    stamps the snapshot and the journal header with a new generation: a
+    process seeing another generation knows that its collections are stale and
+    merges the new snapshot. Reading never takes the lock.
+    """
+
+    def __init__(self, snapshot_filename: str, compact_every: int = 1000) -> None:
+        self.snapshot_filename = snapshot_filename
+        self.filename = journal_filename(snapshot_filename)
+        self.compact_every = compact_every
+        self.seq = 0
+        self.generation = 0
+        self.entries = 0
+        # the changes saved by other processes which were skipped, as the entity had unsaved changes
+        self.conflicts = 0
+        self._lock = FileLock(lock_filename(snapshot_filename))
+        # the journal file and its generation, and the number of its bytes read
+        self._stamp: tuple | None = None
+        self._offset = 0
+        self._collections: dict[str, BaseCollection] = {}
+
+    def load(self) -> tuple[AddressBook, Notes]:
+        """Read the snapshot and replay the journal entries written after it."""
+        # the journal is read first: if it is compacted meanwhile, the snapshot read next holds its entries
+        stamp, entries, self._offset = self._read_entries()
+        book, notes, self.seq, self.generation = read_snapshot(self.snapshot_filename)
+        self._stamp = stamp
+        self.entries = len(entries)
+        collections = {"contacts": book, "notes": notes}
+        for entry in entries:
+            if entry["seq"] <= self.seq:
+                continue
+            collections[entry["c"]].apply_event(entry["op"], entry["key"], tuple(entry["args"]))
+            self.seq = entry["seq"]
+        # the replayed changes are already persisted
+        book.take_changes()
+        notes.take_changes()
+        self._collections = collections
+        return book, notes
+
+    @property
+    def lock(self) -> FileLock:
+        """The lock of the processes writing the files, see `write_batch()`."""
+        return self._lock
+
+    def refresh(self, changes: list[tuple[str, str, str, tuple]] = ()) -> None:
+        """Apply the changes saved by the other processes to the collections, without waiting for them.
+
+        The entities with unsaved changes, or about to be written in `changes`,
+        keep them, they are saved after the other changes and so replace them.
+        """
+        self._catch_up(changes)
+
+    def append_batch(self, changes: list[tuple[str, str, str, tuple]]) -> int:
+        """Write the changes to the journal with a single sync, return the number of bytes written."""
+        with self._lock:
+            self._catch_up(changes)
+            return self.write_batch(changes)
+
+    def write_batch(self, changes: list[tuple[str, str, str, tuple]]) -> int:
+        """Write the changes like `append_batch()`, holding `lock` after `refresh(changes)`.
+
+        The collections are only read, by the compaction too, so another
+        thread may read them meanwhile.
+        """
+        lines = []
+        for collection, event, key, args in changes:
+            self.seq += 1
+            entry = {"seq": self.seq, "c": collection, "op": event, "key": key, "args": [self._encode(arg) for arg in args]}
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        data = "".join(lines).encode("utf-8")
+        with open(self.filename, "ab") as file:
+            if file.tell() > self._offset and self._stamp is not None:
+                # cut off the incomplete entry of a process killed while writing it
+                file.truncate(self._offset)
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        if self._stamp is None:
+            # the journal was created by this write
+            self._stamp, _, _ = self._read_entries()
+        self._offset += len(data)
+        self.entries += len(lines)
+
+        if self.compact_every and self.entries >= self.compact_every:
+            try:
+                self._compact()
+            except RuntimeError:
+                # another thread changed the collections while they were pickled,
+                # the compaction is retried with the next changes
+                pass
+        return len(data)
+
+    def compact(self, book: AddressBook | None = None, notes: Notes | None = None) -> None:
+        """Save the collections to the snapshot file and start a new journal."""
+        with self._lock:
+            if book is None and notes is None and self._collections:
+                self._catch_up()
+            self._compact(book, notes)
+
+    def _compact(self, book: AddressBook | None = None, notes: Notes | None = None) -> None:
+        book = book if book is not None else self._collections.get("contacts")
+        notes = notes if notes is not None else self._collections.get("notes")
+        if book is None or notes is None:
+            raise ValueError("The journal has no collections to compact, load them first.")
+        # a journal which was not loaded saves the passed collections over the newer ones on purpose
+        generation = max(self.generation, read_snapshot_stamp(self.snapshot_filename)[0]) + 1
+        write_snapshot(book, notes, self.snapshot_filename, self.seq, generation)
+
+        header = (json.dumps({"generation": generation, "seq": self.seq}) + "\n").encode("utf-8")
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "wb") as file:
+            file.write(header)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_filename, self.filename)
+        self.generation = generation
+        self.entries = 0
+        self._stamp, _, self._offset = self._read_entries()
+
+    def _catch_up(self, changes: list[tuple[str, str, str, tuple]] = ()) -> None:
+        """Apply the changes saved by the other processes, except to the entities in `changes` or changed since."""
+        if not self._collections:
+            return
+        stamp, entries, offset = self._read_entries()
+        pending = {name: collection.pending_keys() for name, collection in self._collections.items()}
+        for collection, _, key, _ in changes:
+            pending[collection].add(key)
+
+        with ExitStack() as stack:
+            for collection in self._collections.values():
+                stack.enter_context(collection.merging())
+
+            if read_snapshot_stamp(self.snapshot_filename)[0] != self.generation:
+                # compacted by another process, the entries before it are in its snapshot only
+                book, notes, seq, generation = read_snapshot(self.snapshot_filename)
+                self._merge(self._collections["contacts"], book, pending["contacts"])
+                self._merge(self._collections["notes"], notes, pending["notes"])
+                self.seq, self.generation = seq, generation
+
+            for entry in entries:
+                if entry["seq"] <= self.seq:
+                    continue
+                keys = {entry["key"], entry["args"][0]} if entry["op"] in RENAME_EVENTS else {entry["key"]}
+                if entry["op"] != "rename_tag" and keys & pending[entry["c"]]:
+                    self.conflicts += 1
+                else:
+                    self._collections[entry["c"]].apply_event(entry["op"], entry["key"], tuple(entry["args"]))
+                self.seq = entry["seq"]
+
+        self.entries = self.entries + len(entries) if stamp == self._stamp else len(entries)
+        self._stamp, self._offset = stamp, offset
+
+    def _merge(self, collection: BaseCollection, saved: BaseCollection, pending: set[str]) -> None:
+        """Make the collection match the saved one, except for the entities with unsaved changes."""
+        saved_keys = set()
+        for entity in saved.get_all():
+            saved_keys.add(entity.key)
+            current = collection.find_entity(entity.key)
+            data = entity.to_dict()
+            if current is not None and current.to_dict() == data:
+                continue
+            if entity.key in pending:
+                self.conflicts += 1
+            else:
+                collection.apply_event("put", entity.key, (data,))
+        for entity in collection.get_all():
+            if entity.key not in saved_keys and entity.key not in pending:
+                collection.delete(entity.key)
+
+    def _read_entries(self) -> tuple[tuple | None, list[dict], int]:
+        """Read the complete entries not read yet, return the journal stamp, the entries and the bytes read.
+
+        The stamp tells the journal files apart: the file, replaced by every
+        compaction, and the generation in its header. All entries are read if
+        the stamp differs from the last one.
+        """
+        try:
+            file = open(self.filename, "rb")
+        except FileNotFoundError:
+            return None, [], 0
+        with file:
+            status = os.fstat(file.fileno())
+            header_line = file.readline()
+            generation, header_size = 0, 0
+            if header_line.startswith(b'{"generation"') and header_line.endswith(b"\n"):
+                generation, header_size = json.loads(header_line)["generation"], len(header_line)
+            stamp = (status.st_dev, status.st_ino, generation)
+
+            offset = self._offset if stamp == self._stamp else header_size
+            file.seek(offset)
+            entries = []
+            for line in file:
+                # the last entry is incomplete while it is written or if the process was killed
+                # while writing it, the next writer cuts it off
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                offset += len(line)
+        return stamp, entries, offset
+
+    @staticmethod
+    def _encode(arg):
+        if isinstance(arg, BaseEntity):
+            return arg.to_dict()
+        return arg
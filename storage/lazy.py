@@ -0,0 +1,94 @@
+from collections.abc import MutableMapping
+from typing import Callable, Iterator
+
+from fields.notes import Note
+from fields.record import Record
+
+
+class StoredRecords(MutableMapping):
+    """Mapping of names to records which loads each record from the store on first access.
+
+    The store provides `record_names()`, `count_records()`, `has_record()`,
+    `load_record()`, `save_record()` and `delete_record()`.
+    """
+
+    def __init__(self, store, on_load: Callable[[Record], None]) -> None:
+        self._store = store
+        self._on_load = on_load
+        self._cache: dict[str, Record] = {}
+
+    def __getitem__(self, name: str) -> Record:
+        if name in self._cache:
+            return self._cache[name]
+
+        record = self._store.load_record(name)
+        if record is None:
+            raise KeyError(name)
+        self._cache[name] = record
+        self._on_load(record)
+        return record
+
+    def __setitem__(self, name: str, record: Record) -> None:
+        self._store.save_record(record)
+        self._cache[name] = record
+
+    def __delitem__(self, name: str) -> None:
+        if name not in self:
+            raise KeyError(name)
+        self._store.delete_record(name)
+        self._cache.pop(name, None)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._cache or self._store.has_record(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.record_names())
+
+    def __len__(self) -> int:
+        return self._store.count_records()
+
+
+class StoredNotes(MutableMapping):
+    """Mapping of titles to notes which loads each note from the store on first access.
+
+    Only the titles are kept in memory until a note is accessed. The store
+    provides `note_titles()`, `load_note()`, `save_note()` and `delete_note()`.
+    """
+
+    def __init__(self, store, on_load: Callable[[Note], None]) -> None:
+        self._store = store
+        self._on_load = on_load
+        self._titles = dict.fromkeys(store.note_titles())
+        self._cache: dict[str, Note] = {}
+
+    def __getitem__(self, title: str) -> Note:
+        if title in self._cache:
+            return self._cache[title]
+        if title not in self._titles:
+            raise KeyError(title)
+
+        note = self._store.load_note(title)
+        if note is None:
+            raise KeyError(title)
+        self._cache[title] = note
+        self._on_load(note)
+        return note
+
+    def __setitem__(self, title: str, note: Note) -> None:
+        self._store.save_note(note)
+        self._titles[title] = None
+        self._cache[title] = note
+
+    def __delitem__(self, title: str) -> None:
+        del self._titles[title]
+        self._store.delete_note(title)
+        self._cache.pop(title, None)
+
+    def __contains__(self, title: object) -> bool:
+        return title in self._titles
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._titles)
+
+    def __len__(self) -> int:
+        return len(self._titles)
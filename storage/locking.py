@@ -0,0 +1,68 @@
+import os
+import threading
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(file) -> None:
+        file.seek(0)
+        while True:
+            try:
+                # retries for 10 seconds before giving up, keep waiting for the other process
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock(file) -> None:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock(file) -> None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(file) -> None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class FileLock:
+    """Advisory exclusive lock on a file, shared by the processes using the same data.
+
+    Only the processes taking the lock are coordinated, the file itself stays
+    empty. The lock is held by one thread of one process at a time.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def acquire(self) -> None:
+        self._thread_lock.acquire()
+        try:
+            self._file = open(self.filename, "a+b")
+            _lock(self._file)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+
+    def release(self) -> None:
+        try:
+            _unlock(self._file)
+        finally:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
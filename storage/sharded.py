@@ -0,0 +1,401 @@
+import json
+import os
+import pickle
+import sys
+from typing import Callable, Iterator
+
+from fields.notes import Note
+from fields.parallel_search import shard_of
+from fields.record import Record
+from .lazy import StoredNotes, StoredRecords
+from .locking import FileLock
+
+MANIFEST = "manifest.json"
+# locked by the processes writing the shards and the manifest
+LOCK = "shards.lock"
+VERSION = 1
+KINDS = ("contacts", "notes")
+
+
+def _birthday_md(birthday: str | None) -> int:
+    """Get month * 100 + day of the "DD.MM.YYYY" birthday, or 0."""
+    if not birthday:
+        return 0
+    day, month, _ = birthday.split(".")
+    return int(month) * 100 + int(day)
+
+
+def _record_matches(data: dict, query: str) -> bool:
+    if query in data["name"].lower():
+        return True
+    if any(query in phone for phone in data["phones"]):
+        return True
+    for field in ("email", "address"):
+        if data[field] and query in data[field].lower():
+            return True
+    return bool(data["birthday"]) and query in data["birthday"]
+
+
+def _note_matches(data: dict, query: str) -> bool:
+    return query in data["title"].lower() or query in (data["content"] or "").lower()
+
+
+def _write_atomic(filename: str, write: Callable) -> None:
+    """Write the file next to its place and move it there, so a crash leaves the old one."""
+    temporary = filename + ".tmp"
+    with open(temporary, "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, filename)
+
+
+class ShardedStore:
+    """Storage engine keeping contacts and notes in hash-partitioned pickle files.
+
+    The contacts are split by the hash of the name and the notes by the hash
+    of the title into `shards` files each, listed with their counts in the
+    manifest. A shard is read on the first access to one of its keys, so
+    finding one contact reads one shard only, and the names of the shards
+    not loaded are read from the list pickled at the start of every file.
+    The changes mark their keys dirty and only the shards holding them are
+    written back, every `flush_every` changes and on `flush()` or `close()`.
+
+    Several processes may use the same directory. Writing takes the lock file
+    and re-reads the manifest and the shards written by another process since
+    they were loaded, then writes them with the dirty keys of this process
+    applied, so no change is overwritten; if two processes change the same
+    key, the one flushing last wins. The loaded shards written by another
+    process are read again after the next flush.
+
+    Opening the directory with another number of shards rewrites all of them,
+    see `reshard()`; `shard_pickle()` migrates the pickled address book.
+    """
+
+    def __init__(self, directory: str, shards: int = 16, flush_every: int = 50) -> None:
+        if shards < 1:
+            raise ValueError("The store needs at least one shard.")
+        self.directory = directory
+        self.flush_every = flush_every
+        self.loads = 0
+        self.writes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = FileLock(os.path.join(directory, LOCK))
+        self._manifest = self._read_manifest() or self._new_manifest(shards, generation=0)
+        self._open_shards()
+        if self.shards != shards:
+            self.reshard(shards)
+
+    @property
+    def shards(self) -> int:
+        return self._manifest["shards"]
+
+    def close(self) -> None:
+        self.flush()
+
+    def record_mapping(self, on_load: Callable[[Record], None]) -> StoredRecords:
+        """Get the mapping to use as `AddressBook.data`, `on_load` is called for every loaded record."""
+        return StoredRecords(self, on_load)
+
+    def note_mapping(self, on_load: Callable[[Note], None]) -> StoredNotes:
+        """Get the mapping to use as `Notes.notes`, `on_load` is called for every loaded note."""
+        return StoredNotes(self, on_load)
+
+    def import_collections(self, book, notes) -> None:
+        """Copy the contacts and notes of in-memory collections into the store, written with one flush."""
+        for record in book.data.values():
+            self._put("contacts", record.name.value, record.to_dict(), flush=False)
+        for note in notes.get_all():
+            self._put("notes", note.title.value, note.to_dict(), flush=False)
+        self.flush()
+
+    def is_empty(self) -> bool:
+        return not any(shard["count"] for kind in KINDS for shard in self._manifest[kind])
+
+    def flush(self) -> None:
+        """Write the shards holding the dirty keys, then the manifest with their counts."""
+        if not any(self._dirty.values()):
+            return
+        # the data of the dirty keys, None for the deleted ones
+        changes = {kind: {key: self._shard(kind, key).get(key) for key in self._dirty[kind]} for kind in KINDS}
+        with self._lock:
+            self._reread_manifest()
+            by_shard: dict[tuple[str, int], dict[str, dict | None]] = {}
+            for kind in KINDS:
+                for key, data in changes[kind].items():
+                    by_shard.setdefault((kind, shard_of(key, self.shards)), {})[key] = data
+            for (kind, index), entries in sorted(by_shard.items()):
+                shard = self._load_shard(kind, index, reload=True)
+                for key, data in entries.items():
+                    if data is None:
+                        shard.pop(key, None)
+                    else:
+                        shard[key] = data
+                self._manifest[kind][index]["count"] = len(shard)
+                self._write_shard(kind, index, shard)
+            self._write_manifest()
+        self._dirty = {kind: set() for kind in KINDS}
+        self._pending = 0
+        # the other shards written by another process are read again on the next access
+        for kind in KINDS:
+            for index, shard in enumerate(self._loaded[kind]):
+                if shard is not None and self._stamp(kind, index) != self._stamps[kind][index]:
+                    self._loaded[kind][index] = None
+
+    def reshard(self, shards: int) -> None:
+        """Split the contacts and notes into another number of shards, written as new files."""
+        if shards < 1:
+            raise ValueError("The store needs at least one shard.")
+        self.flush()
+        with self._lock:
+            self._reread_manifest()
+            if self.shards != shards:
+                self._reshard(shards)
+
+    def _reshard(self, shards: int) -> None:
+        # without the loaded shards, which another process may have written since
+        self._open_shards()
+        old_files = [shard["file"] for kind in KINDS for shard in self._manifest[kind]]
+        entities = {kind: self._load_all(kind) for kind in KINDS}
+        self._manifest = self._new_manifest(shards, self._manifest["generation"] + 1)
+        self._open_shards()
+        for kind in KINDS:
+            self._loaded[kind] = [{} for _ in range(shards)]
+            for key, data in entities[kind].items():
+                self._loaded[kind][shard_of(key, shards)][key] = data
+            for index, shard in enumerate(self._loaded[kind]):
+                self._manifest[kind][index]["count"] = len(shard)
+                self._write_shard(kind, index, shard)
+        # the old files are dropped only once the manifest lists the new ones
+        self._write_manifest()
+        for file in old_files:
+            try:
+                os.remove(os.path.join(self.directory, file))
+            except FileNotFoundError:
+                pass
+
+    # Contacts
+
+    def record_names(self) -> Iterator[str]:
+        return self._keys("contacts")
+
+    def count_records(self) -> int:
+        return sum(shard["count"] for shard in self._manifest["contacts"])
+
+    def has_record(self, name: str) -> bool:
+        return name in self._shard("contacts", name)
+
+    def load_record(self, name: str) -> Record | None:
+        data = self._shard("contacts", name).get(name)
+        return None if data is None else Record.from_dict(dict(data))
+
+    def save_record(self, record: Record) -> None:
+        self._put("contacts", record.name.value, record.to_dict())
+
+    def delete_record(self, name: str) -> None:
+        self._delete("contacts", name)
+
+    def search_records(self, query: str, tag: str = "") -> list[str]:
+        """Get the names of the contacts matching the lowercased query and the tag."""
+        return [
+            name for name, data in self._items("contacts")
+            if (not tag or tag in data["tags"]) and (not query or _record_matches(data, query))
+        ]
+
+    def phone_names(self, phone: str, prefix: bool = False) -> list[str]:
+        """Get the names of the contacts with the phone number or a number starting with it."""
+        matches = sorted(
+            (number, name) for name, data in self._items("contacts") for number in data["phones"]
+            if (number.startswith(phone) if prefix else number == phone)
+        )
+        # ordered by the number for a prefix, like the SQLite store, and by name for one number
+        return list(dict.fromkeys(name for _, name in matches))
+
+    def birthday_names(self, start_md: int, end_md: int) -> list[str]:
+        """Get the names of the contacts with the birthday between two MMDD values, wrapping at year end."""
+        names = []
+        for name, data in self._items("contacts"):
+            birthday_md = _birthday_md(data["birthday"])
+            if not birthday_md:
+                continue
+            if start_md <= birthday_md <= end_md if start_md <= end_md else birthday_md >= start_md or birthday_md <= end_md:
+                names.append(name)
+        return names
+
+    def rename_tag(self, old_tag: str, new_tag: str) -> None:
+        """Rename the tag of all contacts and notes, marking the keys holding it dirty."""
+        for kind in KINDS:
+            for index in range(self.shards):
+                for key, data in self._load_shard(kind, index).items():
+                    if old_tag in data["tags"]:
+                        data["tags"] = [new_tag if tag == old_tag else tag for tag in data["tags"]]
+                        self._mark_dirty(kind, key, flush=False)
+        if self.flush_every and self._pending >= self.flush_every:
+            self.flush()
+
+    # Notes
+
+    def note_titles(self) -> Iterator[str]:
+        return self._keys("notes")
+
+    def load_note(self, title: str) -> Note | None:
+        data = self._shard("notes", title).get(title)
+        return None if data is None else Note.from_dict(dict(data))
+
+    def save_note(self, note: Note) -> None:
+        self._put("notes", note.title.value, note.to_dict())
+
+    def delete_note(self, title: str) -> None:
+        self._delete("notes", title)
+
+    def search_notes(self, query: str, tag: str = "") -> list[str]:
+        """Get the titles of the notes matching the lowercased query and the tag."""
+        return [
+            title for title, data in self._items("notes")
+            if (not tag or tag in data["tags"]) and (not query or _note_matches(data, query))
+        ]
+
+    # Shards
+
+    def _new_manifest(self, shards: int, generation: int) -> dict:
+        manifest = {"version": VERSION, "shards": shards, "generation": generation}
+        for kind in KINDS:
+            manifest[kind] = [
+                {"file": f"{kind}-{generation}-{index:03}.pkl", "count": 0} for index in range(shards)
+            ]
+        return manifest
+
+    def _read_manifest(self) -> dict | None:
+        try:
+            with open(os.path.join(self.directory, MANIFEST), encoding="utf-8") as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return None
+        if manifest.get("version") != VERSION:
+            raise ValueError(f"'{self.directory}' holds shards of an unknown version.")
+        return manifest
+
+    def _reread_manifest(self) -> None:
+        """Take the manifest written by another process, holding the lock, with the counts of its shards."""
+        manifest = self._read_manifest()
+        if manifest is None:
+            return
+        resharded = manifest["generation"] != self._manifest["generation"]
+        self._manifest = manifest
+        if resharded:
+            # by another process, the loaded shards are gone
+            self._open_shards()
+
+    def _write_manifest(self) -> None:
+        _write_atomic(
+            os.path.join(self.directory, MANIFEST),
+            lambda file: file.write(json.dumps(self._manifest, indent=2).encode("utf-8")),
+        )
+
+    def _open_shards(self) -> None:
+        # the data of the loaded shards by key, None until a shard is loaded
+        self._loaded: dict[str, list[dict[str, dict] | None]] = {kind: [None] * self.shards for kind in KINDS}
+        # the stamps of the shard files the loaded shards were read from or written to
+        self._stamps: dict[str, list[tuple | None]] = {kind: [None] * self.shards for kind in KINDS}
+        self._dirty: dict[str, set[str]] = {kind: set() for kind in KINDS}
+        self._pending = 0
+
+    def _path(self, kind: str, index: int) -> str:
+        return os.path.join(self.directory, self._manifest[kind][index]["file"])
+
+    def _stamp(self, kind: str, index: int) -> tuple | None:
+        """Get the inode and the modification time of the shard file, None if it is missing."""
+        try:
+            status = os.stat(self._path(kind, index))
+        except FileNotFoundError:
+            return None
+        return status.st_ino, status.st_mtime_ns, status.st_size
+
+    def _load_shard(self, kind: str, index: int, reload: bool = False) -> dict[str, dict]:
+        """Get the data of the shard, read again with `reload` if another process wrote it since."""
+        shard = self._loaded[kind][index]
+        if shard is None or reload and self._stamp(kind, index) != self._stamps[kind][index]:
+            try:
+                with open(self._path(kind, index), "rb") as file:
+                    stamp = os.fstat(file.fileno())
+                    # the keys come first, see `_write_shard()`
+                    pickle.load(file)
+                    shard = pickle.load(file)
+                self._stamps[kind][index] = stamp.st_ino, stamp.st_mtime_ns, stamp.st_size
+            except FileNotFoundError:
+                shard = {}
+                self._stamps[kind][index] = None
+            self._loaded[kind][index] = shard
+            self.loads += 1
+        return shard
+
+    def _write_shard(self, kind: str, index: int, shard: dict[str, dict]) -> None:
+        def write(file) -> None:
+            pickle.dump(list(shard), file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(shard, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        _write_atomic(self._path(kind, index), write)
+        self._stamps[kind][index] = self._stamp(kind, index)
+        self.writes += 1
+
+    def _shard(self, kind: str, key: str) -> dict[str, dict]:
+        return self._load_shard(kind, shard_of(key, self.shards))
+
+    def _keys(self, kind: str) -> Iterator[str]:
+        """Iterate over the keys, reading only the key lists of the shards not loaded."""
+        for index in range(self.shards):
+            shard = self._loaded[kind][index]
+            if shard is not None:
+                yield from list(shard)
+                continue
+            try:
+                with open(self._path(kind, index), "rb") as file:
+                    yield from pickle.load(file)
+            except FileNotFoundError:
+                pass
+
+    def _items(self, kind: str) -> Iterator[tuple[str, dict]]:
+        for index in range(self.shards):
+            yield from self._load_shard(kind, index).items()
+
+    def _load_all(self, kind: str) -> dict[str, dict]:
+        return dict(self._items(kind))
+
+    def _mark_dirty(self, kind: str, key: str, flush: bool = True) -> None:
+        self._dirty[kind].add(key)
+        self._pending += 1
+        if flush and self.flush_every and self._pending >= self.flush_every:
+            self.flush()
+
+    def _put(self, kind: str, key: str, data: dict, flush: bool = True) -> None:
+        index = shard_of(key, self.shards)
+        shard = self._load_shard(kind, index)
+        if key not in shard:
+            self._manifest[kind][index]["count"] += 1
+        shard[key] = data
+        self._mark_dirty(kind, key, flush)
+
+    def _delete(self, kind: str, key: str) -> None:
+        index = shard_of(key, self.shards)
+        shard = self._load_shard(kind, index)
+        if shard.pop(key, None) is not None:
+            self._manifest[kind][index]["count"] -= 1
+            self._mark_dirty(kind, key)
+
+
+def shard_pickle(pickle_filename: str, directory: str, shards: int = 16) -> None:
+    """Migrate the pickled address book and notes, with the journal written after them, into shards."""
+    from .journal import Journal
+
+    store = ShardedStore(directory, shards)
+    if not store.is_empty():
+        store.close()
+        raise ValueError(f"'{directory}' holds shards already.")
+    store.import_collections(*Journal(pickle_filename).load())
+    store.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python -m storage.sharded <addressbook.pkl> <directory> [shards]")
+    shard_pickle(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else 16)
@@ -0,0 +1,47 @@
+import os
+import pickle
+
+from fields.address_book import AddressBook
+from fields.notes import Notes
+
+
+def write_snapshot(book: AddressBook, notes: Notes, filename: str, seq: int = 0, generation: int = 0) -> None:
+    """Atomically replace the snapshot file with the pickled collections.
+
+    `seq` is the number of the last journal entry included in the snapshot and
+    `generation` is increased by every compaction. Both are pickled before the
+    collections, so `read_snapshot_stamp()` reads them without the rest.
+    """
+    # pickle into memory first, so the collections are not walked while waiting for the disk
+    stamp = pickle.dumps({"generation": generation, "seq": seq})
+    data = pickle.dumps({"address_book": book, "notes": notes, "seq": seq, "generation": generation})
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as file:
+        file.write(stamp)
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_filename, filename)
+
+
+def read_snapshot(filename: str) -> tuple[AddressBook, Notes, int, int]:
+    """Read the collections, the journal position and the generation from the snapshot file."""
+    try:
+        with open(filename, "rb") as file:
+            data = pickle.load(file)
+            if "address_book" not in data:
+                data = pickle.load(file)
+    except FileNotFoundError:
+        return AddressBook(), Notes(), 0, 0
+    return data.get("address_book", AddressBook()), data.get("notes", Notes()), data.get("seq", 0), data.get("generation", 0)
+
+
+def read_snapshot_stamp(filename: str) -> tuple[int, int]:
+    """Read the generation and the journal position of the snapshot file."""
+    try:
+        with open(filename, "rb") as file:
+            # the snapshots written before the stamp was added are read whole
+            data = pickle.load(file)
+    except FileNotFoundError:
+        return 0, 0
+    return data.get("generation", 0), data.get("seq", 0)
@@ -0,0 +1,241 @@
+import sqlite3
+from typing import Callable
+
+from fields.notes import Note
+from fields.record import Record
+from .lazy import StoredNotes, StoredRecords
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    name TEXT PRIMARY KEY,
+    email TEXT,
+    address TEXT,
+    birthday TEXT,
+    birthday_md INTEGER
+);
+CREATE INDEX IF NOT EXISTS contacts_email ON contacts (email);
+CREATE INDEX IF NOT EXISTS contacts_birthday_md ON contacts (birthday_md);
+
+CREATE TABLE IF NOT EXISTS phones (
+    name TEXT NOT NULL REFERENCES contacts (name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    phone TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phones_name ON phones (name);
+CREATE INDEX IF NOT EXISTS phones_phone ON phones (phone);
+
+CREATE TABLE IF NOT EXISTS contact_tags (
+    name TEXT NOT NULL REFERENCES contacts (name) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contact_tags_name ON contact_tags (name);
+CREATE INDEX IF NOT EXISTS contact_tags_tag ON contact_tags (tag);
+
+CREATE TABLE IF NOT EXISTS notes (
+    title TEXT PRIMARY KEY,
+    content TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS note_tags (
+    title TEXT NOT NULL REFERENCES notes (title) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS note_tags_title ON note_tags (title);
+CREATE INDEX IF NOT EXISTS note_tags_tag ON note_tags (tag);
+"""
+
+
+def _like_pattern(query: str) -> str:
+    """Make a LIKE pattern matching the query as a substring."""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class SQLiteStore:
+    """Storage engine keeping contacts and notes in a local SQLite file.
+
+    The rows are turned into `Record` and `Note` objects only when they are
+    accessed, see `StoredRecords` and `StoredNotes`.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        # SQLite lower() only handles ASCII, the queries are lowercased with str.lower()
+        self.connection.create_function("py_lower", 1, lambda value: value and value.lower(), deterministic=True)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def record_mapping(self, on_load: Callable[[Record], None]) -> StoredRecords:
+        """Get the mapping to use as `AddressBook.data`, `on_load` is called for every loaded record."""
+        return StoredRecords(self, on_load)
+
+    def note_mapping(self, on_load: Callable[[Note], None]) -> StoredNotes:
+        """Get the mapping to use as `Notes.notes`, `on_load` is called for every loaded note."""
+        return StoredNotes(self, on_load)
+
+    def import_collections(self, book, notes) -> None:
+        """Copy the contacts and notes of in-memory collections into the store."""
+        for record in book.data.values():
+            self.save_record(record)
+        for note in notes.get_all():
+            self.save_note(note)
+
+    def is_empty(self) -> bool:
+        return not self.connection.execute(
+            "SELECT EXISTS (SELECT 1 FROM contacts) OR EXISTS (SELECT 1 FROM notes)"
+        ).fetchone()[0]
+
+    # Contacts
+
+    def record_names(self) -> list[str]:
+        return [name for name, in self.connection.execute("SELECT name FROM contacts ORDER BY rowid")]
+
+    def count_records(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def has_record(self, name: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM contacts WHERE name = ?", (name,)).fetchone() is not None
+
+    def load_record(self, name: str) -> Record | None:
+        row = self.connection.execute(
+            "SELECT email, address, birthday FROM contacts WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        email, address, birthday = row
+        phones = self.connection.execute("SELECT phone FROM phones WHERE name = ? ORDER BY position", (name,))
+        tags = self.connection.execute("SELECT tag FROM contact_tags WHERE name = ? ORDER BY position", (name,))
+        return Record.from_dict({
+            "name": name,
+            "phones": [phone for phone, in phones],
+            "email": email,
+            "address": address,
+            "birthday": birthday,
+            "tags": [tag for tag, in tags],
+        })
+
+    def save_record(self, record: Record) -> None:
+        name = record.name.value
+        birthday_md = record.birthday.date.month * 100 + record.birthday.date.day if record.birthday else None
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO contacts (name, email, address, birthday, birthday_md) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET email = excluded.email, address = excluded.address, "
+                "birthday = excluded.birthday, birthday_md = excluded.birthday_md",
+                (
+                    name,
+                    record.email.value if record.email else None,
+                    record.address.value if record.address else None,
+                    record.birthday.value if record.birthday else None,
+                    birthday_md,
+                ),
+            )
+            self.connection.execute("DELETE FROM phones WHERE name = ?", (name,))
+            self.connection.executemany(
+                "INSERT INTO phones (name, position, phone) VALUES (?, ?, ?)",
+                [(name, position, phone.value) for position, phone in enumerate(record.phones)],
+            )
+            self.connection.execute("DELETE FROM contact_tags WHERE name = ?", (name,))
+            self.connection.executemany(
+                "INSERT INTO contact_tags (name, position, tag) VALUES (?, ?, ?)",
+                [(name, position, tag.value) for position, tag in enumerate(getattr(record, "tags", []))],
+            )
+
+    def delete_record(self, name: str) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM contacts WHERE name = ?", (name,))
+
+    def search_records(self, query: str, tag: str = "") -> list[str]:
+        """Get the names of the contacts matching the lowercased query and the tag."""
+        sql = "SELECT name FROM contacts c WHERE 1"
+        params: list = []
+        if tag:
+            sql += " AND EXISTS (SELECT 1 FROM contact_tags t WHERE t.name = c.name AND t.tag = ?)"
+            params.append(tag)
+        if query:
+            pattern = _like_pattern(query)
+            sql += (
+                " AND (py_lower(name) LIKE ? ESCAPE '\\' OR py_lower(email) LIKE ? ESCAPE '\\'"
+                " OR py_lower(address) LIKE ? ESCAPE '\\' OR birthday LIKE ? ESCAPE '\\'"
+                " OR EXISTS (SELECT 1 FROM phones p WHERE p.name = c.name AND p.phone LIKE ? ESCAPE '\\'))"
+            )
+            params += [pattern] * 5
+        return [name for name, in self.connection.execute(sql + " ORDER BY rowid", params)]
+
+    def phone_names(self, phone: str, prefix: bool = False) -> list[str]:
+        """Get the names of the contacts with the phone number or a number starting with it."""
+        if prefix:
+            # a range instead of LIKE so that the index on the numbers is used
+            rows = self.connection.execute(
+                "SELECT DISTINCT name FROM phones WHERE phone >= ? AND phone < ? ORDER BY phone, name",
+                (phone, phone + "\U0010ffff"),
+            )
+        else:
+            rows = self.connection.execute("SELECT DISTINCT name FROM phones WHERE phone = ? ORDER BY name", (phone,))
+        return [name for name, in rows]
+
+    def birthday_names(self, start_md: int, end_md: int) -> list[str]:
+        """Get the names of the contacts with the birthday between two MMDD values, wrapping at year end."""
+        if start_md <= end_md:
+            sql, params = "birthday_md BETWEEN ? AND ?", (start_md, end_md)
+        else:
+            sql, params = "birthday_md >= ? OR birthday_md <= ?", (start_md, end_md)
+        return [name for name, in self.connection.execute(f"SELECT name FROM contacts WHERE {sql} ORDER BY rowid", params)]
+
+    def rename_tag(self, old_tag: str, new_tag: str) -> None:
+        """Rename the tag of all contacts and notes."""
+        with self.connection:
+            self.connection.execute("UPDATE contact_tags SET tag = ? WHERE tag = ?", (new_tag, old_tag))
+            self.connection.execute("UPDATE note_tags SET tag = ? WHERE tag = ?", (new_tag, old_tag))
+
+    # Notes
+
+    def note_titles(self) -> list[str]:
+        return [title for title, in self.connection.execute("SELECT title FROM notes ORDER BY rowid")]
+
+    def load_note(self, title: str) -> Note | None:
+        row = self.connection.execute("SELECT content FROM notes WHERE title = ?", (title,)).fetchone()
+        if row is None:
+            return None
+
+        tags = self.connection.execute("SELECT tag FROM note_tags WHERE title = ? ORDER BY position", (title,))
+        return Note.from_dict({"title": title, "content": row[0], "tags": [tag for tag, in tags]})
+
+    def save_note(self, note: Note) -> None:
+        title = note.title.value
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO notes (title, content) VALUES (?, ?) "
+                "ON CONFLICT (title) DO UPDATE SET content = excluded.content",
+                (title, note.content.value or ""),
+            )
+            self.connection.execute("DELETE FROM note_tags WHERE title = ?", (title,))
+            self.connection.executemany(
+                "INSERT INTO note_tags (title, position, tag) VALUES (?, ?, ?)",
+                [(title, position, tag.value) for position, tag in enumerate(getattr(note, "tags", []))],
+            )
+
+    def delete_note(self, title: str) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM notes WHERE title = ?", (title,))
+
+    def search_notes(self, query: str, tag: str = "") -> list[str]:
+        """Get the titles of the notes matching the lowercased query and the tag."""
+        sql = "SELECT title FROM notes n WHERE 1"
+        params: list = []
+        if tag:
+            sql += " AND EXISTS (SELECT 1 FROM note_tags t WHERE t.title = n.title AND t.tag = ?)"
+            params.append(tag)
+        if query:
+            pattern = _like_pattern(query)
+            sql += " AND (py_lower(title) LIKE ? ESCAPE '\\' OR py_lower(content) LIKE ? ESCAPE '\\')"
+            params += [pattern] * 2
+        return [title for title, in self.connection.execute(sql + " ORDER BY rowid", params)]
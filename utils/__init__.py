@@ -1,4 +1,19 @@
-from .suggest_input import suggest_name_input
-from .color_input import color_input
+from importlib import import_module
 
-__all__ = ["suggest_name_input", "color_input"]
+# the submodules are imported on first use, `suggest_input` brings in prompt_toolkit
+_EXPORTS = {
+    "suggest_name_input": ".suggest_input",
+    "color_input": ".color_input",
+    "PagedTable": ".paged_table",
+    "show_pages": ".pager",
+}
+
+__all__ = ["suggest_name_input", "color_input", "PagedTable", "show_pages"]
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
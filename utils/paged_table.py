@@ -0,0 +1,77 @@
+from itertools import chain, islice
+from typing import Iterable, Iterator
+
+
+class PagedTable:
+    """Grid table rendered page by page from a stream of rows.
+
+    The column widths are computed from the headers and the first
+    `sample_size` rows only, longer values in the next rows are cut, so the
+    first page is ready without looking at the rest of the rows.
+    """
+
+    def __init__(
+        self,
+        headers: list[str],
+        rows: Iterable[list[str]],
+        no_data_str: str = "No data.",
+        page_size: int = 20,
+        sample_size: int = 200,
+        max_width: int = 40,
+    ) -> None:
+        self.headers = headers
+        self.no_data_str = no_data_str
+        self.page_size = page_size
+        self.cursor = 0
+
+        rows = iter(rows)
+        sample = list(islice(rows, sample_size))
+        self._rows: Iterator[list[str]] = chain(sample, rows)
+        # the row read ahead to know if there is another page, shown first on it
+        self._peeked: list[list[str]] = []
+        self._empty = not sample
+        self.widths = [
+            min(max_width, max([len(header)] + [len(row[column]) for row in sample]))
+            for column, header in enumerate(headers)
+        ]
+        self._border = "+" + "+".join("-" * (width + 2) for width in self.widths) + "+"
+        self._header_border = self._border.replace("-", "=")
+        self._done = False
+
+    @property
+    def has_more(self) -> bool:
+        return not self._done
+
+    def next_page(self) -> str | None:
+        """Render the next `page_size` rows, return None when all rows are shown."""
+        if self._done:
+            return None
+        if self._empty:
+            self._done = True
+            width = len(self.no_data_str)
+            return "\n".join(["+" + "-" * (width + 2) + "+", f"| {self.no_data_str} |", "+" + "-" * (width + 2) + "+"])
+
+        rows = self._peeked + list(islice(self._rows, self.page_size - len(self._peeked)))
+        self._peeked = list(islice(self._rows, 1))
+        if not self._peeked:
+            self._done = True
+
+        lines = []
+        if self.cursor == 0:
+            lines += [self._border, self._line(self.headers), self._header_border]
+        for row in rows:
+            lines += [self._line(row), self._border]
+        self.cursor += len(rows)
+        return "\n".join(lines)
+
+    def pages(self) -> Iterator[str]:
+        while (page := self.next_page()) is not None:
+            yield page
+
+    def _line(self, row: list[str]) -> str:
+        cells = []
+        for value, width in zip(row, self.widths):
+            if len(value) > width:
+                value = value[:width - 1] + "…"
+            cells.append(value.ljust(width))
+        return "| " + " | ".join(cells) + " |"
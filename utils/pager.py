@@ -0,0 +1,10 @@
+from .color_input import color_input
+from .paged_table import PagedTable
+
+
+def show_pages(table: PagedTable) -> None:
+    """Print the table page by page, asking before each next page."""
+    for page in table.pages():
+        print(page)
+        if table.has_more and color_input("Press Enter for more or 'q' to stop: ").strip().lower() == "q":
+            break
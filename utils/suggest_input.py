@@ -1,9 +1,29 @@
+from typing import Iterator
+
 from prompt_toolkit import PromptSession
-from prompt_toolkit.completion import WordCompleter
+from prompt_toolkit.completion import CompleteEvent, Completer, Completion
+from prompt_toolkit.document import Document
 from fields.address_book import AddressBook
 
+# one session for all the prompts, creating it takes a while
+_session: PromptSession | None = None
+
+
+class NameCompleter(Completer):
+    """Complete the contact names from the name index of the address book."""
+
+    def __init__(self, book: AddressBook, limit: int = 50) -> None:
+        self.book = book
+        self.limit = limit
+
+    def get_completions(self, document: Document, complete_event: CompleteEvent) -> Iterator[Completion]:
+        prefix = document.text_before_cursor.lstrip()
+        for name in self.book.complete_name(prefix, self.limit):
+            yield Completion(name, start_position=-len(prefix))
+
 
 def suggest_name_input(text: str, book: AddressBook):
-    command_completer = WordCompleter(list(book.data), ignore_case=True)
-    session = PromptSession(completer=command_completer)
-    return session.prompt(text)
+    global _session
+    if _session is None:
+        _session = PromptSession()
+    return _session.prompt(text, completer=NameCompleter(book))